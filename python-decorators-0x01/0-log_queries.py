@@ -1,13 +1,60 @@
 import sqlite3
 import functools
+import inspect
+import time
+
+import query_profiler
+
+
+# Decorator to profile SQL queries (plain or coroutine functions)
+def log_queries(func=None, *, profiler=None):
+    """Record wall time, rows returned and the query's fingerprint.
+
+    The query is the function's `query` argument (else its first one)
+    and `params`, if present, is logged alongside. Aggregates per
+    fingerprint come from profiler.snapshot(); with profiler.enabled
+    off the call goes straight through.
+    """
+    if func is None:
+        return lambda f: log_queries(f, profiler=profiler)
+    store = profiler if profiler is not None else \
+        query_profiler.default_profiler
+    query_of = query_profiler.argument_getter(func, "query", 0)
+    params_of = query_profiler.argument_getter(func, "params")
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            if not store.enabled:
+                return await func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except BaseException:
+                store.record(query_of(args, kwargs), params_of(args, kwargs),
+                             time.perf_counter() - start, None, True)
+                raise
+            store.record(query_of(args, kwargs), params_of(args, kwargs),
+                         time.perf_counter() - start,
+                         query_profiler.row_count(result))
+            return result
+        return async_wrapper
 
-# Decorator to log SQL queries
-def log_queries(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        query = kwargs.get("query") if "query" in kwargs else args[0]
-        print(f"[LOG] Executing SQL Query: {query}")
-        return func(*args, **kwargs)
+        if not store.enabled:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            store.record(query_of(args, kwargs), params_of(args, kwargs),
+                         time.perf_counter() - start, None, True)
+            raise
+        store.record(query_of(args, kwargs), params_of(args, kwargs),
+                     time.perf_counter() - start,
+                     query_profiler.row_count(result))
+        return result
     return wrapper
 
 
@@ -21,6 +68,7 @@ def fetch_all_users(query):
     return results
 
 
-# Fetch users while logging the query
+# Fetch users while profiling the query
 users = fetch_all_users(query="SELECT * FROM users")
 print(users)
+print(query_profiler.default_profiler.snapshot())
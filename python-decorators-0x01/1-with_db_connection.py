@@ -1,26 +1,24 @@
-import sqlite3
-import functools
+from db_pool import with_db_connection
+import statements
 
-def with_db_connection(func):
-    """Decorator to automatically open and close DB connection"""
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect("users.db")
-        try:
-            result = func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-        return result
-    return wrapper
 
-
-@with_db_connection
+@with_db_connection(read_only=True)
 def get_user_by_id(conn, user_id):
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
+    cursor.execute(statements.USER_BY_ID, (user_id,))
     return cursor.fetchone()
 
 
+@with_db_connection(read_only=True)
+def get_users_by_ids(conn, user_ids):
+    # one IN query per 256 ids instead of a query per id
+    return statements.get_users_by_ids(conn, user_ids)
+
+
 # Fetch user by ID with automatic connection handling
 user = get_user_by_id(user_id=1)
 print(user)
+
+# Fetch several users in one round trip
+users = get_users_by_ids(user_ids=[3, 1, 2])
+print(users)
@@ -1,32 +1,66 @@
-import sqlite3
 import functools
+import inspect
 
+import db_pool
+from db_pool import with_db_connection
+import group_commit
+import result_cache
 
-def with_db_connection(func):
-    """Decorator to automatically open and close DB connection"""
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect("users.db")
-        try:
-            result = func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-        return result
-    return wrapper
 
+def transactional(func=None, *, batch=None):
+    """Decorator to wrap DB operations in a transaction
+
+    Tables written inside the transaction are invalidated in the shared
+    query cache once it commits. Works on coroutine functions too.
+
+    Marks the function as a write, so with_db_connection keeps it on
+    the writer connection even under read_only=True.
+    transactional(batch=GroupCommit(...)) instead runs each call on the
+    batch's writer connection and shares its commit with other calls;
+    the batch supplies conn, so don't stack with_db_connection on top.
+    """
+    if func is None:
+        return lambda f: transactional(f, batch=batch)
+
+    if batch is not None:
+        if inspect.iscoroutinefunction(func):
+            raise TypeError("batched transactional needs a plain function")
+
+        @functools.wraps(func)
+        def batched(*args, **kwargs):
+            return batch.run(func, *args, **kwargs)
+        batched.writes = True
+        return db_pool.supplies_connection(batched, func)
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(conn, *args, **kwargs):
+            try:
+                async with result_cache.track_tables_async(conn) as (_, written):
+                    result = await func(conn, *args, **kwargs)
+                await conn.commit()
+                result_cache.default_cache.invalidate_tables(written)
+                return result
+            except Exception as e:
+                await conn.rollback()
+                print(f"[ERROR] Transaction rolled back due to: {e}")
+                raise
+        async_wrapper.writes = True  # never routed to a read-only connection
+        return async_wrapper
 
-def transactional(func):
-    """Decorator to wrap DB operations in a transaction"""
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
         try:
-            result = func(conn, *args, **kwargs)
+            with result_cache.track_tables(conn) as (_, written):
+                result = func(conn, *args, **kwargs)
             conn.commit()  # commit if no error
+            result_cache.default_cache.invalidate_tables(written)
             return result
         except Exception as e:
             conn.rollback()  # rollback on error
             print(f"[ERROR] Transaction rolled back due to: {e}")
             raise
+    wrapper.writes = True  # never routed to a read-only connection
     return wrapper
 
 
@@ -40,3 +74,18 @@ def update_user_email(conn, user_id, new_email):
 # ✅ Update user's email with automatic transaction handling
 update_user_email(user_id=1, new_email='Crawford_Cartwright@hotmail.com')
 print("User email updated successfully!")
+
+
+# Many small writes: one commit (and fsync) per batch instead of per call.
+# They all rewrite the email set above, so no other user is touched.
+with group_commit.GroupCommit("users.db", max_writes=100) as writes:
+    @transactional(batch=writes)
+    def set_user_email(conn, user_id, new_email):
+        conn.execute("UPDATE users SET email = ? WHERE id = ?",
+                     (new_email, user_id))
+
+    for _ in range(5):
+        set_user_email(1, 'Crawford_Cartwright@hotmail.com')
+    writes.executemany("UPDATE users SET email = ? WHERE id = ?",
+                       [('Crawford_Cartwright@hotmail.com', 1)] * 5)
+print(f"Batched writes committed: {writes.stats()}")
@@ -1,46 +1,97 @@
 import time
+import asyncio
 import sqlite3
 import functools
+import inspect
+import itertools
 
+from db_pool import with_db_connection
+import retry_policy
 
-def with_db_connection(func):
-    """Decorator to automatically open and close DB connection"""
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect("users.db")
-        try:
-            result = func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-        return result
-    return wrapper
 
+def retry_on_failure(retries=3, delay=2, max_delay=30, deadline=None,
+                     budget=None):
+    """Decorator to retry DB operations if transient errors occur
+
+    Makes up to `retries` attempts, sleeping a full-jitter exponential
+    backoff (base `delay`, capped at max_delay) in between, and gives up
+    early once `deadline` seconds have passed since the first attempt
+    or the shared retry budget runs dry. Counters are in budget.stats().
+    Coroutine functions back off with asyncio.sleep, so the event loop
+    keeps running between attempts. Errors retrying cannot fix (see
+    retry_policy.is_transient) are raised at once.
+    """
+    budget = budget or retry_policy.default_budget
+
+    def next_pause(attempt, started, error):
+        """Seconds to sleep before retrying, or None to give up"""
+        if attempt >= retries:
+            return None
+        pause = retry_policy.backoff(attempt, delay, max_delay)
+        if deadline is not None and \
+                time.monotonic() - started + pause > deadline:
+            budget.deadline_exceeded()
+            return None
+        if not budget.take_retry():
+            return None
+        print(f"[Retry {attempt}/{retries}] Transient error: {error} "
+              f"(retrying in {pause:.2f}s)")
+        return pause
 
-def retry_on_failure(retries=3, delay=2):
-    """Decorator to retry DB operations if transient errors occur"""
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                budget.start_call()
+                started = time.monotonic()
+                for attempt in itertools.count(1):
+                    budget.attempt()
+                    try:
+                        result = await func(*args, **kwargs)
+                    except sqlite3.OperationalError as e:
+                        if not retry_policy.is_transient(e):
+                            budget.permanent()
+                            raise
+                        pause = next_pause(attempt, started, e)
+                        if pause is None:
+                            budget.gave_up()
+                            raise
+                        await asyncio.sleep(pause)
+                        budget.slept(pause)
+                    else:
+                        budget.succeeded()
+                        return result
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            last_exception = None
-            for attempt in range(1, retries + 1):
+            budget.start_call()
+            started = time.monotonic()
+            for attempt in itertools.count(1):
+                budget.attempt()
                 try:
-                    return func(*args, **kwargs)
+                    result = func(*args, **kwargs)
                 except sqlite3.OperationalError as e:
-                    # SQLite transient error (like database is locked, etc.)
-                    last_exception = e
-                    print(f"[Retry {attempt}/{retries}] Transient error: {e}")
-                    if attempt < retries:
-                        time.sleep(delay)
-                except Exception as e:
-                    # For any other unexpected errors → do not retry
-                    raise
-            # If all retries failed, re-raise last exception
-            raise last_exception
+                    # SQLite transient error (like database is locked, etc.);
+                    # anything else propagates without a retry, and so
+                    # do errors like writing through a read-only connection
+                    if not retry_policy.is_transient(e):
+                        budget.permanent()
+                        raise
+                    pause = next_pause(attempt, started, e)
+                    if pause is None:
+                        budget.gave_up()
+                        raise
+                    time.sleep(pause)
+                    budget.slept(pause)
+                else:
+                    budget.succeeded()
+                    return result
         return wrapper
     return decorator
 
 
-@with_db_connection
+@with_db_connection(read_only=True)
 @retry_on_failure(retries=3, delay=1)
 def fetch_users_with_retry(conn):
     cursor = conn.cursor()
@@ -1,47 +1,76 @@
 import time
-import sqlite3
 import functools
+import inspect
 
+from db_pool import with_db_connection
+import result_cache
 
-query_cache = {}
 
+# LRU, size-bounded, TTL-aware; writes through transactional invalidate it
+query_cache = result_cache.default_cache
 
-def with_db_connection(func):
-    """Decorator to automatically open and close DB connection"""
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect("users.db")
-        try:
-            result = func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-        return result
-    return wrapper
 
+def cache_query(func=None, *, ttl=None, cache=None):
+    """Decorator to cache query results by query string and parameters
 
-def cache_query(func):
-    """Decorator to cache query results based on SQL query string"""
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
+    Usable bare or as cache_query(ttl=seconds, cache=QueryCache(...)).
+    Results are tagged with the tables the query read, so a write to
+    one of them through transactional evicts them. Threads that miss on
+    the same key at once wait for a single execution of the query;
+    coroutine functions get the same behaviour without blocking the loop.
+    """
+    if func is None:
+        return lambda f: cache_query(f, ttl=ttl, cache=cache)
+    store = cache if cache is not None else query_cache
+
+    def cache_key(args, kwargs):
+        # conn is left out; everything else (query, params) is the key
+        return (func.__module__, func.__qualname__,
+                result_cache.freeze(args[1:]), result_cache.freeze(kwargs))
+
+    def query_of(args, kwargs):
         # Get SQL query string (must be passed as kwarg or arg)
         query = kwargs.get("query")
         if query is None and len(args) > 1:
             query = args[1]  # conn is args[0], query should be args[1]
+        return query
 
-        # Return cached result if available
-        if query in query_cache:
+    def report(status, query):
+        if status == "hit":
             print(f"[CACHE HIT] Returning cached result for: {query}")
-            return query_cache[query]
+        elif status == "coalesced":
+            print(f"[CACHE WAIT] Shared in-flight result for: {query}")
+        else:
+            print(f"[CACHE MISS] Caching result for: {query}")
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            async def load():
+                async with result_cache.track_tables_async(args[0]) as (tables, _):
+                    return await func(*args, **kwargs), tables
+
+            status, result = await store.aget_or_load(
+                cache_key(args, kwargs), load, ttl=ttl)
+            report(status, query_of(args, kwargs))
+            return result
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        def load():
+            with result_cache.track_tables(args[0]) as (tables, _):
+                return func(*args, **kwargs), tables
 
-        # Otherwise, execute the function and cache result
-        result = func(*args, **kwargs)
-        query_cache[query] = result
-        print(f"[CACHE MISS] Caching result for: {query}")
+        # Concurrent misses on the same key share one execution
+        status, result = store.get_or_load(
+            cache_key(args, kwargs), load, ttl=ttl)
+        report(status, query_of(args, kwargs))
         return result
     return wrapper
 
 
-@with_db_connection
+@with_db_connection(read_only=True)
 @cache_query
 def fetch_users_with_cache(conn, query):
     cursor = conn.cursor()
@@ -0,0 +1,103 @@
+"""Time id lookups one statement per id against statements.get_users_by_ids.
+
+    python bench_statements.py [users] [ids]
+
+Runs against a throwaway database of `users` rows (default 10000) and
+looks up `ids` random ids (default 1000) several ways, on one pooled
+connection so the statement cache is warm:
+
+- per id: USER_BY_ID once per id on the one connection
+- per id, checkout: the same with a pool checkout per id, as calling
+  the decorated get_user_by_id in a loop does
+- batched: get_users_by_ids, one padded IN query per 256 ids
+- per id, tracked: per id inside result_cache.track_tables, to check
+  that tracking leaves the cached statement in place
+- batched, no cache: get_users_by_ids with cached_statements=0, i.e.
+  compiling every statement again
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import db_pool
+import result_cache
+import statements
+
+USERS = 10_000
+IDS = 1_000
+REPEAT = 20
+
+
+def make_database(path, users):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE users "
+                 "(id INTEGER PRIMARY KEY, name TEXT, email TEXT, age INTEGER)")
+    conn.executemany(
+        "INSERT INTO users (name, email, age) VALUES (?, ?, ?)",
+        ((f"user{i}", f"user{i}@example.org", 18 + i % 80)
+         for i in range(users)))
+    conn.commit()
+    conn.close()
+
+
+def per_id(conn, ids):
+    return [conn.execute(statements.USER_BY_ID, (i,)).fetchone() for i in ids]
+
+
+def per_id_checkout(pool, ids):
+    rows = []
+    for i in ids:
+        with pool.connection() as conn:
+            rows.append(conn.execute(statements.USER_BY_ID, (i,)).fetchone())
+    return rows
+
+
+def per_id_tracked(conn, ids):
+    rows = []
+    for i in ids:
+        with result_cache.track_tables(conn):
+            rows.append(conn.execute(statements.USER_BY_ID, (i,)).fetchone())
+    return rows
+
+
+def timed(pool, func, ids):
+    """Best of REPEAT runs of func(conn, ids), in milliseconds"""
+    with pool.connection() as conn:
+        func(conn, ids)  # warm the statement cache
+        best = float("inf")
+        for _ in range(REPEAT):
+            start = time.perf_counter()
+            func(conn, ids)
+            best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main(users=USERS, count=IDS):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "users.db")
+        make_database(path, users)
+        ids = random.Random(0).sample(range(1, users + 1), count)
+        pool = db_pool.ConnectionPool(path)
+        uncached = db_pool.ConnectionPool(path, cached_statements=0)
+        runs = [
+            ("per id", timed(pool, per_id, ids)),
+            ("per id, checkout",
+             timed(pool, lambda conn, ids: per_id_checkout(pool, ids), ids)),
+            ("batched", timed(pool, statements.get_users_by_ids, ids)),
+            ("per id, tracked", timed(pool, per_id_tracked, ids)),
+            ("batched, no cache",
+             timed(uncached, statements.get_users_by_ids, ids)),
+        ]
+        pool.close()
+        uncached.close()
+    baseline = runs[0][1]
+    print(f"{count} lookups over {users} users, best of {REPEAT}")
+    for label, ms in runs:
+        print(f"  {label:<20} {ms:>8.2f} ms  {baseline / ms:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,310 @@
+import functools
+import inspect
+import sqlite3
+import threading
+import time
+import urllib.parse
+from contextlib import contextmanager
+
+try:
+    import aiosqlite
+except ImportError:
+    aiosqlite = None
+
+
+JOURNAL_MODES = ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF")
+SYNCHRONOUS_LEVELS = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+def read_only_uri(database):
+    """sqlite URI opening database read-only"""
+    return f"file:{urllib.parse.quote(database)}?mode=ro"
+
+
+class Connection(sqlite3.Connection):
+    """sqlite3 connection that can carry attributes, so per-connection
+    state (e.g. result_cache's table tracking) can live on it"""
+
+
+class PoolTimeout(Exception):
+    """No connection became free within the pool's timeout"""
+
+
+def configure(conn, journal_mode=None, synchronous=None):
+    """Apply durability settings to a connection.
+
+    journal_mode="WAL" lets readers run alongside the writer and, with
+    synchronous="NORMAL", syncs only at checkpoints instead of on every
+    commit; a crash may then lose the last commits but never corrupts
+    the database. None leaves the database's setting alone.
+    """
+    if journal_mode is not None:
+        if journal_mode.upper() not in JOURNAL_MODES:
+            raise ValueError(f"journal_mode must be one of {JOURNAL_MODES}")
+        conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+    if synchronous is not None:
+        if synchronous.upper() not in SYNCHRONOUS_LEVELS:
+            raise ValueError(
+                f"synchronous must be one of {SYNCHRONOUS_LEVELS}")
+        conn.execute(f"PRAGMA synchronous = {synchronous}")
+    return conn
+
+
+class ConnectionPool:
+    """Thread-safe pool of sqlite3 connections to one database file.
+
+    Connections are opened with check_same_thread=False but a thread
+    gets back the connection it used last whenever that one is idle,
+    so in practice each hot thread keeps its own connection. Between
+    min_size and max_size connections are kept open; idle ones beyond
+    min_size are closed after idle_timeout seconds. journal_mode and
+    synchronous are applied to every connection (see configure()).
+    Since connections outlive the calls using them, each keeps up to
+    cached_statements compiled statements ready for reuse. With
+    read_only=True connections are opened with mode=ro and any write
+    through them fails.
+    """
+
+    def __init__(self, database="users.db", min_size=1, max_size=5,
+                 idle_timeout=60.0, timeout=10.0, journal_mode=None,
+                 synchronous=None, cached_statements=256, read_only=False):
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError("need 0 <= min_size <= max_size and max_size >= 1")
+        self.database = database
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.cached_statements = cached_statements
+        self.read_only = read_only
+        self._cond = threading.Condition()
+        self._idle = []      # [conn, last thread id, returned at]
+        self._size = 0
+        self._closed = False
+        self._metrics = {
+            "checkouts": 0,
+            "created": 0,
+            "evicted": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+        with self._cond:
+            for _ in range(min_size):
+                self._idle.append([self._open(), None, time.monotonic()])
+
+    def _open(self):
+        if self.read_only:
+            conn = sqlite3.connect(read_only_uri(self.database), uri=True,
+                                   check_same_thread=False,
+                                   cached_statements=self.cached_statements,
+                                   factory=Connection)
+        else:
+            conn = sqlite3.connect(self.database, check_same_thread=False,
+                                   cached_statements=self.cached_statements,
+                                   factory=Connection)
+        configure(conn, self.journal_mode, self.synchronous)
+        self._size += 1
+        self._metrics["created"] += 1
+        return conn
+
+    def _evict_idle(self, now):
+        """Close connections idle past idle_timeout, keeping min_size"""
+        for entry in list(self._idle):
+            if self._size <= self.min_size:
+                break
+            if now - entry[2] >= self.idle_timeout:
+                self._idle.remove(entry)
+                entry[0].close()
+                self._size -= 1
+                self._metrics["evicted"] += 1
+
+    def _take_idle(self, me):
+        for entry in reversed(self._idle):
+            if entry[1] == me:
+                self._idle.remove(entry)
+                return entry[0]
+        return self._idle.pop()[0] if self._idle else None
+
+    def acquire(self):
+        """Check out a connection, waiting up to timeout for one"""
+        me = threading.get_ident()
+        start = time.monotonic()
+        waited = False
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("pool is closed")
+            self._evict_idle(start)
+            while True:
+                conn = self._take_idle(me)
+                if conn is None and self._size < self.max_size:
+                    conn = self._open()
+                if conn is not None:
+                    break
+                remaining = self.timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    raise PoolTimeout(
+                        f"no connection to {self.database} within {self.timeout}s")
+                waited = True
+                self._cond.wait(remaining)
+
+            self._metrics["checkouts"] += 1
+            if waited:
+                wait = time.monotonic() - start
+                self._metrics["waits"] += 1
+                self._metrics["wait_seconds"] += wait
+                self._metrics["max_wait_seconds"] = max(
+                    self._metrics["max_wait_seconds"], wait)
+        return conn
+
+    def release(self, conn):
+        """Return a connection; any open transaction is rolled back"""
+        if conn.in_transaction:
+            conn.rollback()
+        with self._cond:
+            if self._closed:
+                conn.close()
+                self._size -= 1
+                return
+            self._idle.append([conn, threading.get_ident(), time.monotonic()])
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def metrics(self):
+        """Snapshot of checkout/wait counters and current sizes"""
+        with self._cond:
+            snapshot = dict(self._metrics)
+            snapshot["size"] = self._size
+            snapshot["idle"] = len(self._idle)
+            snapshot["in_use"] = self._size - len(self._idle)
+        return snapshot
+
+    def close(self):
+        """Close idle connections now and busy ones as they come back"""
+        with self._cond:
+            self._closed = True
+            for conn, _, _ in self._idle:
+                conn.close()
+            self._size -= len(self._idle)
+            self._idle = []
+
+
+class Router:
+    """Read/write split over one database.
+
+    Writes share a single writer connection (max_size=1), so writers
+    queue in-process for it instead of failing with "database is
+    locked"; the writer switches the database to WAL, where readers
+    never block it nor each other. Callers that only read can opt in
+    to a pool of read-only connections, on `replica` when one is given
+    (a copy kept up to date elsewhere) or else on the database itself.
+    """
+
+    def __init__(self, database="users.db", replica=None, readers=8,
+                 journal_mode="WAL", synchronous="NORMAL", **options):
+        self.database = database
+        self.writer = ConnectionPool(
+            database, min_size=1, max_size=1, journal_mode=journal_mode,
+            synchronous=synchronous, **options)
+        self.reader = ConnectionPool(
+            replica or database, min_size=0, max_size=readers,
+            read_only=True, **options)
+        self._held = threading.local()  # .conn: writer this thread holds
+
+    @contextmanager
+    def connection(self, write=True):
+        """Context manager checking out the writer, or a reader with
+        write=False; anything written through a reader fails with
+        "attempt to write a readonly database".
+
+        A thread that already holds the writer gets the same connection
+        back (and keeps it) instead of waiting on itself, so a write
+        calling another write shares its connection and transaction.
+        """
+        if not write:
+            with self.reader.connection() as conn:
+                yield conn
+            return
+        held = getattr(self._held, "conn", None)
+        if held is not None:
+            yield held
+            return
+        with self.writer.connection() as conn:
+            self._held.conn = conn
+            try:
+                yield conn
+            finally:
+                self._held.conn = None
+
+    def metrics(self):
+        return {"writer": self.writer.metrics(),
+                "reader": self.reader.metrics()}
+
+    def close(self):
+        self.writer.close()
+        self.reader.close()
+
+
+_routers = {}
+_routers_lock = threading.Lock()
+
+
+def get_router(database="users.db", **options):
+    """Shared Router for a database file, created on first use"""
+    with _routers_lock:
+        if database not in _routers:
+            _routers[database] = Router(database, **options)
+        return _routers[database]
+
+
+def supplies_connection(wrapper, func):
+    """Give wrapper func's signature minus its first parameter, the
+    connection the wrapper passes in itself, so signature readers
+    (query_profiler.argument_getter) see what callers actually pass"""
+    signature = inspect.signature(func)
+    wrapper.__signature__ = signature.replace(
+        parameters=list(signature.parameters.values())[1:])
+    return wrapper
+
+
+def with_db_connection(func=None, *, read_only=False, database="users.db"):
+    """Decorator to pass in a pooled DB connection, returned afterwards
+
+    Calls get the database's writer connection (see Router) unless the
+    function opts in with with_db_connection(read_only=True), which
+    hands it one of the read-only connections instead; functions marked
+    as writes (transactional does that) stay on the writer either way.
+    Coroutine functions get an aiosqlite connection instead.
+    """
+    if func is None:
+        return lambda f: with_db_connection(f, read_only=read_only,
+                                            database=database)
+    write = not read_only or getattr(func, "writes", False)
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            if aiosqlite is None:
+                raise RuntimeError("async with_db_connection needs aiosqlite")
+            if write:
+                connect = aiosqlite.connect(database)
+            else:
+                connect = aiosqlite.connect(read_only_uri(database), uri=True)
+            async with connect as conn:
+                return await func(conn, *args, **kwargs)
+        return supplies_connection(async_wrapper, func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with get_router(database).connection(write) as conn:
+            return func(conn, *args, **kwargs)
+    return supplies_connection(wrapper, func)
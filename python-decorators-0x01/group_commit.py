@@ -0,0 +1,192 @@
+import itertools
+import sqlite3
+import threading
+import time
+
+import db_pool
+import result_cache
+
+EXECUTEMANY_CHUNK = 1000
+
+
+def executemany(conn, sql, rows, chunk_size=EXECUTEMANY_CHUNK):
+    """Run sql for every parameter tuple in rows; returns rows changed.
+
+    The statement is compiled once and rows are fed to it chunk_size at
+    a time, so any iterable (a generator, say) works without being
+    materialized. Committing is left to the caller (e.g. transactional).
+    """
+    changed = 0
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            return changed
+        changed += conn.executemany(sql, chunk).rowcount
+
+
+class GroupCommit:
+    """One writer connection whose commits are shared by many calls.
+
+    Each run() executes inside a savepoint of a long-lived transaction,
+    so a failing call only rolls back its own writes. The transaction
+    commits once max_writes calls have joined it, or max_delay seconds
+    after the first of them, whichever comes first; one fsync then
+    covers them all. A call's writes are therefore durable only after
+    the next commit: use flush() (or leave the `with` block) when a
+    caller has to know. If a timed commit fails for good (anything but
+    "database is locked", e.g. a deferred foreign key), the pending
+    writes are rolled back and the error is raised by the next run()
+    or flush(); stats() counts such failures either way.
+    """
+
+    def __init__(self, database="users.db", max_writes=500, max_delay=0.05,
+                 journal_mode="WAL", synchronous="NORMAL"):
+        self.database = database
+        self.max_writes = max_writes
+        self.max_delay = max_delay
+        # autocommit mode: BEGIN/SAVEPOINT/COMMIT are issued by hand
+        self._conn = db_pool.configure(
+            sqlite3.connect(database, check_same_thread=False,
+                            isolation_level=None, factory=db_pool.Connection),
+            journal_mode, synchronous)
+        self._cond = threading.Condition(threading.RLock())
+        self._pending = 0
+        self._first_at = None
+        self._written = set()
+        self._closed = False
+        self._failed = None  # error of a lost timed commit, not yet raised
+        self._stats = {"writes": 0, "commits": 0, "rollbacks": 0,
+                       "commit_failures": 0}
+        self._flusher = threading.Thread(
+            target=self._run, name="group-commit", daemon=True)
+        self._flusher.start()
+
+    def run(self, func, *args, **kwargs):
+        """Call func(conn, *args, **kwargs) inside the shared transaction"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("group commit is closed")
+            self._raise_failed()
+            if not self._conn.in_transaction:
+                self._conn.execute("BEGIN")
+            self._conn.execute("SAVEPOINT call")
+            try:
+                with result_cache.track_tables(self._conn) as (_, written):
+                    result = func(self._conn, *args, **kwargs)
+            except BaseException:
+                self._undo_call()
+                raise
+            self._written |= written
+            if self._pending + 1 >= self.max_writes:
+                # COMMIT with the savepoint still open: it ends the
+                # savepoint too, and if it fails this call can still be
+                # taken back instead of riding along with a later commit
+                try:
+                    self._commit()
+                except BaseException:
+                    self._undo_call()
+                    raise
+                self._stats["writes"] += 1
+                return result
+            self._conn.execute("RELEASE call")
+            self._stats["writes"] += 1
+            self._pending += 1
+            if self._pending == 1:
+                self._first_at = time.monotonic()
+                self._cond.notify()
+            return result
+
+    def _undo_call(self):
+        """Roll back the open `call` savepoint, keeping earlier calls"""
+        if self._conn.in_transaction:
+            self._conn.execute("ROLLBACK TO call")
+            self._conn.execute("RELEASE call")
+        else:
+            # the error already rolled back the whole transaction
+            self._drop_pending()
+        self._stats["rollbacks"] += 1
+
+    def _drop_pending(self):
+        self._pending = 0
+        self._first_at = None
+        self._written = set()
+
+    def _raise_failed(self):
+        if self._failed is not None:
+            error, self._failed = self._failed, None
+            raise error
+
+    def executemany(self, sql, rows, chunk_size=EXECUTEMANY_CHUNK):
+        """Bulk write through the shared transaction; returns rows changed"""
+        return self.run(lambda conn: executemany(conn, sql, rows, chunk_size))
+
+    def _commit(self):
+        if self._conn.in_transaction:
+            self._conn.execute("COMMIT")
+            self._stats["commits"] += 1
+        written, self._written = self._written, set()
+        self._pending = 0
+        self._first_at = None
+        result_cache.default_cache.invalidate_tables(written)
+
+    def flush(self):
+        """Commit everything run so far, now"""
+        with self._cond:
+            self._raise_failed()
+            self._commit()
+
+    def _run(self):
+        """Flusher thread: commit max_delay after the first pending write"""
+        with self._cond:
+            while not self._closed:
+                if self._first_at is None:
+                    self._cond.wait()
+                    continue
+                remaining = self._first_at + self.max_delay - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+                try:
+                    self._commit()
+                except sqlite3.OperationalError:
+                    # e.g. database is locked: keep the transaction open
+                    # and try again one window later
+                    self._stats["commit_failures"] += 1
+                    self._first_at = time.monotonic()
+                except sqlite3.Error as e:
+                    # retrying cannot fix this one: drop the batch, keep
+                    # the thread, and tell the next caller
+                    self._stats["commit_failures"] += 1
+                    if self._conn.in_transaction:
+                        self._conn.execute("ROLLBACK")
+                    self._drop_pending()
+                    self._failed = e
+
+    def stats(self):
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot["pending"] = self._pending
+        return snapshot
+
+    def close(self):
+        """Commit what is pending and close the connection, even if that
+        commit fails"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._flusher.join()
+        try:
+            with self._cond:
+                self._raise_failed()
+                self._commit()
+        finally:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,187 @@
+import atexit
+import collections
+import functools
+import inspect
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+
+# latency histogram buckets are 2^(1/4) wide (about 19%), from 1 microsecond
+_BUCKET_BASE = 2 ** 0.25
+_BUCKET_FLOOR = 1e-6
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACES = re.compile(r"\s+")
+
+logger = logging.getLogger("query_profiler")
+
+
+@functools.lru_cache(maxsize=4096)
+def fingerprint(sql):
+    """Normalized form of a statement: literals become ?, IN lists (?+),
+    comments and extra whitespace go, keywords are lowercased."""
+    sql = _COMMENTS.sub(" ", sql)
+    sql = _STRINGS.sub("?", sql)
+    sql = _NUMBERS.sub("?", sql)
+    sql = _IN_LISTS.sub("(?+)", sql)
+    return _SPACES.sub(" ", sql).strip().rstrip(";").lower()
+
+
+def argument_getter(func, name, default_index=None):
+    """Function pulling argument `name` out of a call to func.
+
+    The position is looked up once from func's signature, so the getter
+    is a dict lookup or an index on the hot path. Decorators that pass
+    an argument in themselves (with_db_connection's conn) must hide it
+    from that signature; see db_pool.supplies_connection.
+    """
+    names = list(inspect.signature(func).parameters)
+    index = names.index(name) if name in names else default_index
+
+    def get(args, kwargs):
+        if name in kwargs:
+            return kwargs[name]
+        if index is not None and index < len(args):
+            return args[index]
+        return None
+    return get
+
+
+def row_count(result):
+    """Rows in a query function's result, when that can be told cheaply"""
+    if result is None:
+        return None
+    if isinstance(result, (list, tuple)):
+        return len(result)
+    rowcount = getattr(result, "rowcount", -1)
+    return rowcount if isinstance(rowcount, int) and rowcount >= 0 else None
+
+
+class QueryStats:
+    """Aggregated timings of one query fingerprint"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.rows = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = collections.Counter()
+
+    def add(self, seconds, rows, failed):
+        self.count += 1
+        self.errors += failed
+        self.rows += rows or 0
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.buckets[max(0, int(math.log(
+            max(seconds, _BUCKET_FLOOR) / _BUCKET_FLOOR, _BUCKET_BASE)))] += 1
+
+    def percentile(self, p):
+        """Upper edge of the bucket holding the p-th fraction of calls"""
+        rank = p * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.max, _BUCKET_FLOOR * _BUCKET_BASE ** (bucket + 1))
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "rows": self.rows,
+            "total_seconds": self.total,
+            "mean_seconds": self.total / self.count if self.count else None,
+            "p50_seconds": self.percentile(0.50),
+            "p95_seconds": self.percentile(0.95),
+            "p99_seconds": self.percentile(0.99),
+            "max_seconds": self.max,
+        }
+
+
+class QueryProfiler:
+    """Collects query timings off the hot path.
+
+    record() only appends to a bounded deque; a daemon thread drains it
+    every flush_interval seconds, fingerprints the statements, folds
+    them into per-fingerprint QueryStats and, when the query_profiler
+    logger is enabled for INFO, logs one JSON line per query. When
+    `enabled` is false the decorators skip timing altogether.
+    """
+
+    def __init__(self, enabled=True, flush_interval=1.0, max_pending=100000):
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self._pending = collections.deque(maxlen=max_pending)
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def record(self, sql, params, seconds, rows, failed=False):
+        """Queue one execution; cheap enough to call on every query"""
+        self._pending.append((sql, params, seconds, rows, failed, time.time()))
+        if self._thread is None:
+            self._start()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="query-profiler", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        """Fold everything recorded so far into the aggregates"""
+        log = logger.isEnabledFor(logging.INFO)
+        with self._lock:
+            while self._pending:
+                sql, params, seconds, rows, failed, at = self._pending.popleft()
+                key = fingerprint(sql) if isinstance(sql, str) else repr(sql)
+                stats = self._stats.get(key)
+                if stats is None:
+                    stats = self._stats[key] = QueryStats()
+                stats.add(seconds, rows, failed)
+                if log:
+                    logger.info(json.dumps({
+                        "at": at, "fingerprint": key, "seconds": seconds,
+                        "rows": rows, "failed": failed,
+                        "params": None if params is None else repr(params),
+                    }))
+
+    def snapshot(self):
+        """{fingerprint: aggregate}, most total time first"""
+        self.flush()
+        with self._lock:
+            items = [(k, s.as_dict()) for k, s in self._stats.items()]
+        items.sort(key=lambda item: item[1]["total_seconds"], reverse=True)
+        return dict(items)
+
+    def reset(self):
+        with self._lock:
+            self._pending.clear()
+            self._stats.clear()
+
+    def close(self):
+        """Stop the flush thread after a final flush"""
+        self._stop.set()
+        self.flush()
+
+
+# QUERY_PROFILE=0 turns profiling off for every decorated function
+default_profiler = QueryProfiler(
+    enabled=os.environ.get("QUERY_PROFILE", "1") != "0")
@@ -0,0 +1,341 @@
+import asyncio
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+
+import query_profiler
+
+READ_ACTIONS = {sqlite3.SQLITE_READ}
+WRITE_ACTIONS = {sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE,
+                 sqlite3.SQLITE_DELETE}
+# statements that touch no table; sqlite3 issues BEGIN on its own
+# between preparing a write and running it, so these must not claim
+# the tables the authorizer just saw
+TRANSACTION_CONTROL = {"BEGIN", "COMMIT", "END", "ROLLBACK", "SAVEPOINT",
+                       "RELEASE"}
+
+# fingerprint -> (tables read, tables written), learned at prepare time
+_statement_tables = {}
+# connections that cannot carry attributes, tracked only while a block
+# is open: id -> _Tracking
+_temporary = {}
+
+
+class _Tracking:
+    """Table tracking state of one connection.
+
+    The authorizer only runs while a statement is being prepared, which
+    happens once per statement while it stays in the connection's
+    statement cache; what it sees is remembered per statement
+    fingerprint when the trace callback reports the statement running.
+    Later runs of the cached statement are looked up by fingerprint.
+    """
+
+    def __init__(self):
+        self.stack = []      # (reads, writes) of the open track_tables blocks
+        self.prepared = None  # tables of the statement being prepared
+
+    def authorize(self, action, arg1, arg2, db_name, trigger):
+        if arg1 and not arg1.startswith("sqlite_"):
+            if action in READ_ACTIONS or action in WRITE_ACTIONS:
+                if self.prepared is None:
+                    self.prepared = (set(), set())
+                self.prepared[action in WRITE_ACTIONS].add(arg1)
+        return sqlite3.SQLITE_OK
+
+    def trace(self, sql):
+        words = sql.split(None, 1)
+        if words and words[0].upper() in TRANSACTION_CONTROL:
+            return
+        prepared, self.prepared = self.prepared, None
+        if prepared is None and not self.stack:
+            return
+        key = query_profiler.fingerprint(sql)
+        if prepared is not None:
+            _statement_tables[key] = prepared
+        else:
+            prepared = _statement_tables.get(key)
+        if prepared is not None:
+            for reads, writes in self.stack:
+                reads |= prepared[0]
+                writes |= prepared[1]
+
+
+def _attach(conn):
+    """(state, installed, temporary) for conn, creating the state if new"""
+    state = getattr(conn, "_table_tracking", None)
+    if state is not None:
+        return state, False, False
+    state = _temporary.get(id(conn))
+    if state is not None:
+        return state, False, True
+    state = _Tracking()
+    try:
+        conn._table_tracking = state
+        return state, True, False
+    except AttributeError:  # a plain sqlite3.Connection
+        _temporary[id(conn)] = state
+        return state, True, True
+
+
+@contextmanager
+def track_tables(conn):
+    """Collect the tables read and written on conn inside the block.
+
+    Uses the sqlite authorizer, which sees every table a statement
+    touches (views and triggers included). Blocks may nest. Setting an
+    authorizer expires every prepared statement, so on connections that
+    accept attributes (db_pool.Connection, aiosqlite's) the hooks are
+    installed once and left in place; plain sqlite3 connections get
+    them for the duration of the outermost block only.
+    """
+    state, install, temporary = _attach(conn)
+    if install:
+        conn.set_authorizer(state.authorize)
+        conn.set_trace_callback(state.trace)
+    reads, writes = set(), set()
+    state.stack.append((reads, writes))
+    try:
+        yield reads, writes
+    finally:
+        state.stack.pop()
+        # a statement that was prepared but never ran (a bind error,
+        # say) must not lend its tables to the next one
+        state.prepared = None
+        if temporary and not state.stack:
+            del _temporary[id(conn)]
+            conn.set_authorizer(None)
+            conn.set_trace_callback(None)
+
+
+@asynccontextmanager
+async def track_tables_async(conn):
+    """track_tables for an aiosqlite connection"""
+    state, install, temporary = _attach(conn)
+    if install:
+        await conn.set_authorizer(state.authorize)
+        await conn.set_trace_callback(state.trace)
+    reads, writes = set(), set()
+    state.stack.append((reads, writes))
+    try:
+        yield reads, writes
+    finally:
+        state.stack.pop()
+        state.prepared = None
+        if temporary and not state.stack:
+            del _temporary[id(conn)]
+            await conn.set_authorizer(None)
+            await conn.set_trace_callback(None)
+
+
+def estimate_size(value):
+    """Approximate bytes held by a cached result"""
+    try:
+        return len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+def freeze(value):
+    """Hashable form of call arguments, for use in cache keys"""
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, set):
+        return frozenset(freeze(v) for v in value)
+    return value
+
+
+class _Flight:
+    """One in-progress load that concurrent callers wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class QueryCache:
+    """LRU cache of query results, bounded in bytes, with per-entry TTL.
+
+    Each entry remembers which tables it was read from;
+    invalidate_tables() drops every entry that depends on a table that
+    was written to. get_or_load() coalesces concurrent misses on the
+    same key into a single load (aget_or_load() does the same for
+    coroutines). All methods are thread-safe.
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, default_ttl=300.0):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()  # key -> (value, size, expires, tables)
+        self._bytes = 0
+        self._generation = 0
+        self._written_at = {}          # table -> generation of last write
+        self._inflight = {}            # key -> _Flight
+        self._async_inflight = {}      # (loop, key) -> asyncio.Future
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0,
+                       "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def generation(self):
+        """Token to pass to put() so results raced by a write are dropped"""
+        with self._lock:
+            return self._generation
+
+    def get(self, key):
+        """(True, value) on a live hit, else (False, None)"""
+        with self._lock:
+            hit, value = self._lookup(key)
+            self._stats["hits" if hit else "misses"] += 1
+            return hit, value
+
+    def _lookup(self, key):
+        """get() without the hit/miss counting; caller holds the lock"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        if entry[2] is not None and entry[2] <= time.monotonic():
+            self._drop(key)
+            self._stats["expirations"] += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, entry[0]
+
+    def put(self, key, value, tables=(), ttl=None, generation=None):
+        """Store value unless it is larger than the whole cache, or one
+        of its tables was written after `generation` was taken."""
+        size = estimate_size(value)
+        ttl = self.default_ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            if generation is not None and any(
+                    self._written_at.get(t, -1) >= generation for t in tables):
+                return False
+            if size > self.max_bytes:
+                return False
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size, expires, frozenset(tables))
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+            return True
+
+    def get_or_load(self, key, load, ttl=None):
+        """Cached value for key, calling load() at most once at a time.
+
+        load() returns (value, tables). While one caller is loading a
+        key, other callers for that key wait and share its result (or
+        its exception). Returns (status, value) where status is "hit",
+        "miss" (this caller loaded) or "coalesced".
+        """
+        with self._lock:
+            hit, value = self._lookup(key)
+            if hit:
+                self._stats["hits"] += 1
+                return "hit", value
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                # only the caller that runs the load counts as a miss
+                flight = self._inflight[key] = _Flight()
+                generation = self._generation
+                self._stats["misses"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return "coalesced", flight.value
+
+        try:
+            value, tables = load()
+            flight.value = value
+            self.put(key, value, tables, ttl=ttl, generation=generation)
+            return "miss", value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
+
+    async def aget_or_load(self, key, load, ttl=None):
+        """get_or_load for an async load(); waiters await, never block"""
+        loop = asyncio.get_running_loop()
+        flight_key = (loop, key)
+        with self._lock:
+            hit, value = self._lookup(key)
+            if hit:
+                self._stats["hits"] += 1
+                return "hit", value
+            future = self._async_inflight.get(flight_key)
+            if future is None:
+                self._stats["misses"] += 1
+                generation = self._generation
+            else:
+                self._stats["coalesced"] += 1
+        if future is not None:
+            # shield: one waiter being cancelled must not cancel the load
+            return "coalesced", await asyncio.shield(future)
+
+        future = self._async_inflight[flight_key] = loop.create_future()
+        try:
+            value, tables = await load()
+            self.put(key, value, tables, ttl=ttl, generation=generation)
+            future.set_result(value)
+            return "miss", value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody was waiting
+            raise
+        finally:
+            del self._async_inflight[flight_key]
+
+    def _drop(self, key):
+        _, size, _, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def invalidate_tables(self, tables):
+        """Drop every entry read from any of tables"""
+        tables = set(tables)
+        if not tables:
+            return 0
+        with self._lock:
+            for table in tables:
+                self._written_at[table] = self._generation
+            self._generation += 1
+            stale = [k for k, e in self._entries.items() if e[3] & tables]
+            for key in stale:
+                self._drop(key)
+            self._stats["invalidations"] += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["entries"] = len(self._entries)
+            snapshot["bytes"] = self._bytes
+        return snapshot
+
+
+# shared by cache_query and transactional across the decorator modules
+default_cache = QueryCache()
@@ -0,0 +1,125 @@
+import random
+import threading
+import time
+
+
+class CircuitOpen(Exception):
+    """Calls are failing fast because recent ones kept running out of retries"""
+
+
+# OperationalError messages that no amount of retrying will change
+PERMANENT_ERRORS = ("readonly database", "no such table", "no such column",
+                    "syntax error")
+
+
+def is_transient(error):
+    """False for errors that fail the same way on every attempt, such as
+    a write through a mode=ro connection"""
+    message = str(error)
+    return not any(text in message for text in PERMANENT_ERRORS)
+
+
+def backoff(attempt, base, cap):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^n)).
+
+    Spreading every sleep over the whole window is what stops writers
+    that hit "database is locked" together from retrying together.
+    """
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+class RetryBudget:
+    """Process-wide limit on retries, shared by every decorated function.
+
+    A token bucket: each call earns `ratio` tokens and each retry spends
+    one, so under sustained failure retries add at most about ratio
+    extra load, with max_tokens allowing short bursts. After trip_after
+    calls in a row give up, the breaker opens and calls raise
+    CircuitOpen for `cooldown` seconds. After that a single call goes
+    through as a probe while the rest keep failing fast: its success
+    closes the breaker, its giving up opens it again, and if it ends
+    neither way another probe is let through one cooldown later.
+    """
+
+    def __init__(self, ratio=0.2, max_tokens=20, trip_after=5, cooldown=5.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.trip_after = trip_after
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._tokens = float(max_tokens)
+        self._failures = 0
+        self._open_until = 0.0
+        self._stats = {"calls": 0, "attempts": 0, "retries": 0,
+                       "sleep_seconds": 0.0, "give_ups": 0, "permanent": 0,
+                       "budget_exhausted": 0, "deadline_exceeded": 0,
+                       "short_circuited": 0, "trips": 0, "probes": 0}
+
+    def start_call(self):
+        """Admit a call, or raise CircuitOpen while the breaker is open"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._open_until:
+                self._stats["short_circuited"] += 1
+                raise CircuitOpen(
+                    f"{self._failures} calls in a row ran out of retries")
+            if self._open_until:
+                # half open: this call is the probe, the others wait
+                # for its outcome (or for another cooldown)
+                self._open_until = now + self.cooldown
+                self._stats["probes"] += 1
+            self._stats["calls"] += 1
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def attempt(self):
+        with self._lock:
+            self._stats["attempts"] += 1
+
+    def take_retry(self):
+        """Spend a token for one retry; False when the budget is empty"""
+        with self._lock:
+            if self._tokens < 1:
+                self._stats["budget_exhausted"] += 1
+                return False
+            self._tokens -= 1
+            self._stats["retries"] += 1
+            return True
+
+    def slept(self, seconds):
+        with self._lock:
+            self._stats["sleep_seconds"] += seconds
+
+    def deadline_exceeded(self):
+        with self._lock:
+            self._stats["deadline_exceeded"] += 1
+
+    def permanent(self):
+        """A call failed with an error retrying cannot fix; it does not
+        count towards tripping the breaker"""
+        with self._lock:
+            self._stats["permanent"] += 1
+
+    def succeeded(self):
+        with self._lock:
+            self._failures = 0
+            self._open_until = 0.0
+
+    def gave_up(self):
+        with self._lock:
+            self._stats["give_ups"] += 1
+            self._failures += 1
+            if self._failures >= self.trip_after:
+                self._open_until = time.monotonic() + self.cooldown
+                self._stats["trips"] += 1
+
+    def stats(self):
+        """Snapshot of the counters plus the current token balance"""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["tokens"] = round(self._tokens, 2)
+            snapshot["open"] = time.monotonic() < self._open_until
+        return snapshot
+
+
+# shared by every retry_on_failure that is not given its own budget
+default_budget = RetryBudget()
@@ -0,0 +1,209 @@
+import functools
+import heapq
+import inspect
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+import query_profiler
+
+logger = logging.getLogger("slow_queries")
+
+
+def scanned_tables(plan):
+    """Table names an EXPLAIN QUERY PLAN walks without an index
+
+    Scans of things that are not tables are skipped: the constant row
+    of a FROM-less SELECT, and materialized subqueries, views and CTEs
+    ("SCAN SUBQUERY 1" before SQLite 3.36, the MATERIALIZE/CO-ROUTINE
+    name after).
+    """
+    derived = set()
+    tables = []
+    for detail in plan:
+        words = detail.split()
+        if words[:1] in (["MATERIALIZE"], ["CO-ROUTINE"]) and len(words) > 1:
+            derived.add(words[-1])
+        # "SCAN users" on SQLite >= 3.36, "SCAN TABLE users" before
+        if words[:1] != ["SCAN"] or "INDEX" in words or len(words) < 2:
+            continue
+        if words[1] in ("CONSTANT", "SUBQUERY") or words[1].startswith("("):
+            continue
+        name = words[2] if words[1] == "TABLE" else words[1]
+        if name not in derived:
+            tables.append(name)
+    return tables
+
+
+class SlowQuery:
+    """Everything known about one slow fingerprint"""
+
+    def __init__(self, fingerprint, sql):
+        self.fingerprint = fingerprint
+        self.sql = sql
+        self.params = None
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.plan = None
+        self.scanned = []
+
+    def as_dict(self):
+        return {
+            "fingerprint": self.fingerprint,
+            "sql": self.sql,
+            "params": None if self.params is None else repr(self.params),
+            "count": self.count,
+            "total_seconds": self.total,
+            "max_seconds": self.max,
+            "plan": self.plan,
+            "full_scan": self.scanned,
+        }
+
+
+class SlowQueryLog:
+    """Slow executions over `threshold` seconds, grouped by fingerprint.
+
+    The first slow execution of a fingerprint captures its EXPLAIN QUERY
+    PLAN; later ones only update the counters. Only the top_n
+    fingerprints by worst time are kept.
+    """
+
+    def __init__(self, threshold=0.1, top_n=20, database="users.db"):
+        self.threshold = threshold
+        self.top_n = top_n
+        self.database = database
+        self._lock = threading.Lock()
+        self._queries = {}
+
+    def _entry(self, sql, seconds):
+        """(entry, needs_plan) for sql, creating the entry if new.
+
+        When the log is full the fastest entry is evicted first, so the
+        new one is never dropped straight after its EXPLAIN; (None,
+        False) if seconds would not beat even the fastest kept entry.
+        """
+        key = query_profiler.fingerprint(sql)
+        with self._lock:
+            entry = self._queries.get(key)
+            if entry is not None:
+                return entry, False
+            if len(self._queries) >= self.top_n:
+                fastest = min(self._queries.values(), key=lambda e: e.max)
+                if fastest.max >= seconds:
+                    return None, False
+                del self._queries[fastest.fingerprint]
+            entry = self._queries[key] = SlowQuery(key, sql)
+            return entry, True
+
+    def _update(self, entry, params, seconds):
+        with self._lock:
+            entry.count += 1
+            entry.total += seconds
+            if seconds >= entry.max:
+                entry.max = seconds
+                entry.params = params
+        logger.warning("slow query (%.3fs): %s", seconds, entry.fingerprint)
+
+    def _set_plan(self, entry, rows):
+        # rows are (id, parent, notused, detail)
+        entry.plan = [row[3] for row in rows]
+        entry.scanned = scanned_tables(entry.plan)
+
+    def explain(self, conn, sql, params):
+        """EXPLAIN QUERY PLAN detail lines for sql, or the error text"""
+        own = conn is None or not hasattr(conn, "execute")
+        if own:
+            conn = sqlite3.connect(self.database)
+        try:
+            return conn.execute(
+                f"EXPLAIN QUERY PLAN {sql}", params or ()).fetchall()
+        except sqlite3.Error as e:
+            return [(0, 0, 0, f"EXPLAIN failed: {e}")]
+        finally:
+            if own:
+                conn.close()
+
+    async def explain_async(self, conn, sql, params):
+        """explain() on an aiosqlite connection"""
+        try:
+            async with conn.execute(
+                    f"EXPLAIN QUERY PLAN {sql}", params or ()) as cursor:
+                return await cursor.fetchall()
+        except sqlite3.Error as e:
+            return [(0, 0, 0, f"EXPLAIN failed: {e}")]
+
+    def dump(self, path=None):
+        """Slow fingerprints, worst first; also written as JSON to path"""
+        with self._lock:
+            rows = [e.as_dict() for e in heapq.nlargest(
+                self.top_n, self._queries.values(), key=lambda e: e.max)]
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(rows, f, indent=2)
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self._queries.clear()
+
+
+default_log = SlowQueryLog()
+
+
+def detect_slow_queries(func=None, *, threshold=None, log=None):
+    """Decorator flagging calls slower than threshold (default: the log's)
+
+    Stack it under with_db_connection so the connection is its first
+    argument and EXPLAIN runs on it; otherwise a connection to
+    log.database is opened for the one-off EXPLAIN. The statement is
+    the `query` argument and `params` its bindings.
+    """
+    if func is None:
+        return lambda f: detect_slow_queries(f, threshold=threshold, log=log)
+    store = log if log is not None else default_log
+    query_of = query_profiler.argument_getter(func, "query", 0)
+    params_of = query_profiler.argument_getter(func, "params")
+    conn_of = query_profiler.argument_getter(func, "conn")
+
+    def limit():
+        return store.threshold if threshold is None else threshold
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = await func(*args, **kwargs)
+            seconds = time.perf_counter() - start
+            sql = query_of(args, kwargs)
+            if seconds >= limit() and isinstance(sql, str):
+                params = params_of(args, kwargs)
+                entry, needs_plan = store._entry(sql, seconds)
+                if needs_plan:
+                    conn = conn_of(args, kwargs)
+                    rows = await store.explain_async(conn, sql, params) \
+                        if conn is not None else store.explain(None, sql, params)
+                    store._set_plan(entry, rows)
+                if entry is not None:
+                    store._update(entry, params, seconds)
+            return result
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        sql = query_of(args, kwargs)
+        if seconds >= limit() and isinstance(sql, str):
+            params = params_of(args, kwargs)
+            entry, needs_plan = store._entry(sql, seconds)
+            if needs_plan:
+                store._set_plan(entry, store.explain(
+                    conn_of(args, kwargs), sql, params))
+            if entry is not None:
+                store._update(entry, params, seconds)
+        return result
+    return wrapper
@@ -0,0 +1,49 @@
+import functools
+import itertools
+
+# IN lists are padded up to one of these sizes, so a lookup of any
+# length reuses one of a handful of statements from the connection's
+# statement cache instead of compiling a new one per length
+IN_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+USER_BY_ID = "SELECT * FROM users WHERE id = ?"
+USERS_BY_IDS = "SELECT * FROM users WHERE id IN ({})"
+
+
+def bucket(n):
+    """Smallest IN_BUCKETS size holding n values"""
+    for size in IN_BUCKETS:
+        if n <= size:
+            return size
+    return IN_BUCKETS[-1]
+
+
+@functools.lru_cache(maxsize=None)
+def in_list(template, size):
+    """template with its {} replaced by `size` placeholders"""
+    return template.format(", ".join("?" * size))
+
+
+def select_in(conn, template, values):
+    """Rows of template (with an IN ({}) slot) over all values.
+
+    Values go in chunks of at most IN_BUCKETS[-1], each padded with its
+    last value up to a bucket size; repeating a value inside IN does not
+    change the result.
+    """
+    rows = []
+    values = iter(values)
+    while True:
+        chunk = list(itertools.islice(values, IN_BUCKETS[-1]))
+        if not chunk:
+            return rows
+        size = bucket(len(chunk))
+        chunk += chunk[-1:] * (size - len(chunk))
+        rows.extend(conn.execute(in_list(template, size), chunk).fetchall())
+
+
+def get_users_by_ids(conn, ids):
+    """Users for ids in one query per 256 ids, in ids order (None if missing)"""
+    ids = list(ids)
+    by_id = {row[0]: row for row in select_in(conn, USERS_BY_IDS, set(ids))}
+    return [by_id.get(user_id) for user_id in ids]
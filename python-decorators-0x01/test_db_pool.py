@@ -0,0 +1,216 @@
+"""Tests for db_pool.py; run with `python -m unittest` or pytest."""
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+import db_pool
+
+
+class ConnectionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.tmpdir.name, "users.db")
+        conn = sqlite3.connect(self.database)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_sizes_are_validated(self):
+        for min_size, max_size in ((2, 1), (0, 0), (-1, 1)):
+            with self.assertRaises(ValueError):
+                db_pool.ConnectionPool(self.database, min_size, max_size)
+
+    def test_thread_gets_back_its_own_connection(self):
+        pool = db_pool.ConnectionPool(self.database, min_size=2, max_size=4)
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            self.assertIs(first, second)
+        self.assertEqual(pool.metrics()["created"], 2)
+        pool.close()
+
+    def test_never_opens_more_than_max_size(self):
+        pool = db_pool.ConnectionPool(self.database, min_size=0, max_size=3)
+        in_use = []
+        peak = []
+        lock = threading.Lock()
+
+        def worker():
+            for _ in range(20):
+                with pool.connection() as conn:
+                    with lock:
+                        in_use.append(conn)
+                        peak.append(len(in_use))
+                    conn.execute("SELECT 1").fetchone()
+                    time.sleep(0.001)
+                    with lock:
+                        in_use.remove(conn)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        metrics = pool.metrics()
+        self.assertLessEqual(max(peak), 3)
+        self.assertLessEqual(metrics["created"], 3)
+        self.assertEqual(metrics["checkouts"], 160)
+        self.assertEqual(metrics["in_use"], 0)
+        pool.close()
+
+    def test_acquire_times_out_when_exhausted(self):
+        pool = db_pool.ConnectionPool(self.database, min_size=0, max_size=1,
+                                      timeout=0.05)
+        conn = pool.acquire()
+        with self.assertRaises(db_pool.PoolTimeout):
+            pool.acquire()
+        pool.release(conn)
+        pool.release(pool.acquire())
+        pool.close()
+
+    def test_waiter_gets_released_connection(self):
+        pool = db_pool.ConnectionPool(self.database, min_size=0, max_size=1)
+        conn = pool.acquire()
+        got = []
+        waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+        waiter.start()
+        time.sleep(0.05)
+        pool.release(conn)
+        waiter.join(1)
+        self.assertEqual(got, [conn])
+        self.assertEqual(pool.metrics()["waits"], 1)
+        pool.release(conn)
+        pool.close()
+
+    def test_release_rolls_back_open_transaction(self):
+        pool = db_pool.ConnectionPool(self.database, min_size=0, max_size=1)
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO users (name) VALUES ('left open')")
+        with pool.connection() as conn:
+            count, = conn.execute("SELECT COUNT(*) FROM users").fetchone()
+        self.assertEqual(count, 0)
+        pool.close()
+
+    def test_idle_connections_beyond_min_size_are_evicted(self):
+        pool = db_pool.ConnectionPool(self.database, min_size=1, max_size=3,
+                                      idle_timeout=0.01)
+        conns = [pool.acquire() for _ in range(3)]
+        for conn in conns:
+            pool.release(conn)
+        time.sleep(0.02)
+        pool.release(pool.acquire())
+        metrics = pool.metrics()
+        self.assertEqual(metrics["size"], 1)
+        self.assertEqual(metrics["evicted"], 2)
+        pool.close()
+
+    def test_configure_applies_durability_settings(self):
+        pool = db_pool.ConnectionPool(self.database, journal_mode="WAL",
+                                      synchronous="NORMAL")
+        with pool.connection() as conn:
+            mode, = conn.execute("PRAGMA journal_mode").fetchone()
+            level, = conn.execute("PRAGMA synchronous").fetchone()
+        self.assertEqual((mode, level), ("wal", 1))
+        with self.assertRaises(ValueError):
+            db_pool.configure(sqlite3.connect(":memory:"), journal_mode="FAST")
+        pool.close()
+
+
+class RouterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.tmpdir.name, "users.db")
+        conn = sqlite3.connect(self.database)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.commit()
+        conn.close()
+        self.router = db_pool.Router(self.database, readers=2)
+
+    def tearDown(self):
+        self.router.close()
+        self.tmpdir.cleanup()
+
+    def test_default_connection_is_the_writer(self):
+        with self.router.connection() as conn:
+            conn.execute("INSERT INTO users (name) VALUES ('a')")
+            conn.commit()
+        with self.router.connection(write=False) as conn:
+            count, = conn.execute("SELECT COUNT(*) FROM users").fetchone()
+        self.assertEqual(count, 1)
+        self.assertEqual(self.router.metrics()["writer"]["checkouts"], 1)
+
+    def test_nested_writer_checkout_reuses_the_connection(self):
+        with self.router.connection() as outer:
+            with self.router.connection() as inner:
+                self.assertIs(inner, outer)
+        self.assertEqual(self.router.metrics()["writer"]["checkouts"], 1)
+        # released for good once the outermost block exits
+        got = []
+        other = threading.Thread(
+            target=lambda: got.append(self.router.writer.acquire()))
+        other.start()
+        other.join(1)
+        self.assertEqual(got, [outer])
+
+    def test_readers_refuse_writes(self):
+        with self.router.connection(write=False) as conn:
+            with self.assertRaisesRegex(sqlite3.OperationalError, "readonly"):
+                conn.execute("INSERT INTO users (name) VALUES ('a')")
+
+
+class WithDbConnectionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.tmpdir.name, "users.db")
+        conn = sqlite3.connect(self.database)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("INSERT INTO users (name) VALUES ('a')")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        db_pool._routers.pop(self.database).close()
+        self.tmpdir.cleanup()
+
+    def test_writes_by_default_and_reads_on_opt_in(self):
+        @db_pool.with_db_connection(database=self.database)
+        def rename(conn, name):
+            conn.execute("UPDATE users SET name = ?", (name,))
+            conn.commit()
+
+        @db_pool.with_db_connection(read_only=True, database=self.database)
+        def names(conn):
+            return [n for n, in conn.execute("SELECT name FROM users")]
+
+        rename("b")
+        self.assertEqual(names(), ["b"])
+        metrics = db_pool.get_router(self.database).metrics()
+        self.assertEqual(metrics["writer"]["checkouts"], 1)
+        self.assertEqual(metrics["reader"]["checkouts"], 1)
+
+    def test_decorated_call_inside_another_does_not_deadlock(self):
+        @db_pool.with_db_connection(database=self.database)
+        def count(conn):
+            return conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+        @db_pool.with_db_connection(database=self.database)
+        def outer(conn):
+            conn.execute("INSERT INTO users (name) VALUES ('c')")
+            return count()
+
+        db_pool.get_router(self.database).writer.timeout = 0.5
+        # the inner call shares the writer, so it sees the open insert
+        self.assertEqual(outer(), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
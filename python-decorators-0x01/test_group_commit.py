@@ -0,0 +1,137 @@
+"""Tests for group_commit.py; run with `python -m unittest` or pytest."""
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+
+import group_commit
+
+
+def insert(conn, value):
+    conn.execute("INSERT INTO t (x) VALUES (?)", (value,))
+
+
+def fail(conn, value):
+    insert(conn, value)
+    raise ValueError("call failed")
+
+
+class GroupCommitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.tmpdir.name, "users.db")
+        conn = sqlite3.connect(self.database)
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def committed(self):
+        conn = sqlite3.connect(self.database)
+        values = [x for x, in conn.execute("SELECT x FROM t ORDER BY x")]
+        conn.close()
+        return values
+
+    def lock_database(self, writes):
+        """Hold a read lock so the next COMMIT fails with 'locked'"""
+        writes._conn.execute("PRAGMA busy_timeout = 0")
+        reader = sqlite3.connect(self.database, isolation_level=None)
+        reader.execute("BEGIN")
+        reader.execute("SELECT COUNT(*) FROM t").fetchone()
+        return reader
+
+    def test_max_writes_calls_share_one_commit(self):
+        with group_commit.GroupCommit(self.database, max_writes=3,
+                                      max_delay=60) as writes:
+            for value in range(5):
+                writes.run(insert, value)
+            self.assertEqual(self.committed(), [0, 1, 2])
+            stats = writes.stats()
+            self.assertEqual((stats["commits"], stats["pending"]), (1, 2))
+        self.assertEqual(self.committed(), [0, 1, 2, 3, 4])
+
+    def test_failing_call_only_rolls_back_its_own_writes(self):
+        with group_commit.GroupCommit(self.database, max_delay=60) as writes:
+            writes.run(insert, 1)
+            with self.assertRaises(ValueError):
+                writes.run(fail, 2)
+            writes.run(insert, 3)
+            self.assertEqual(writes.stats()["rollbacks"], 1)
+        self.assertEqual(self.committed(), [1, 3])
+
+    def test_commits_max_delay_after_first_write(self):
+        with group_commit.GroupCommit(self.database, max_delay=0.02) as writes:
+            writes.run(insert, 1)
+            deadline = time.monotonic() + 2
+            while writes.stats()["pending"] and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(writes.stats()["commits"], 1)
+            self.assertEqual(self.committed(), [1])
+
+    def test_executemany_streams_rows(self):
+        with group_commit.GroupCommit(self.database, max_delay=60) as writes:
+            changed = writes.executemany(
+                "INSERT INTO t (x) VALUES (?)",
+                ((i,) for i in range(25)), chunk_size=10)
+        self.assertEqual(changed, 25)
+        self.assertEqual(self.committed(), list(range(25)))
+
+    def test_failed_commit_takes_back_the_triggering_call(self):
+        writes = group_commit.GroupCommit(
+            self.database, max_writes=2, max_delay=60, journal_mode="DELETE")
+        writes.run(insert, 1)
+        reader = self.lock_database(writes)
+        with self.assertRaises(sqlite3.OperationalError):
+            writes.run(insert, 2)
+        reader.close()
+        writes.close()
+        # the earlier call stays pending and commits; the failed one never
+        self.assertEqual(self.committed(), [1])
+
+    def test_flusher_survives_a_commit_that_cannot_succeed(self):
+        conn = sqlite3.connect(self.database)
+        conn.executescript("""
+            CREATE TABLE parent (id INTEGER PRIMARY KEY);
+            CREATE TABLE child (parent_id INTEGER REFERENCES parent
+                                DEFERRABLE INITIALLY DEFERRED);
+        """)
+        conn.close()
+        writes = group_commit.GroupCommit(self.database, max_delay=0.02)
+        writes._conn.execute("PRAGMA foreign_keys = ON")
+        # only the deferred check at COMMIT catches the missing parent
+        writes.run(lambda conn: conn.execute("INSERT INTO child VALUES (1)"))
+        deadline = time.monotonic() + 2
+        while not writes.stats()["commit_failures"] and \
+                time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(writes._flusher.is_alive())
+        self.assertEqual(writes.stats()["pending"], 0)
+        with self.assertRaises(sqlite3.IntegrityError):
+            writes.run(insert, 1)
+        writes.run(insert, 2)
+        deadline = time.monotonic() + 2
+        while writes.stats()["pending"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.committed(), [2])
+        writes.close()
+
+    def test_close_stops_the_flusher_when_commit_fails(self):
+        writes = group_commit.GroupCommit(
+            self.database, max_delay=60, journal_mode="DELETE")
+        writes.run(insert, 1)
+        reader = self.lock_database(writes)
+        with self.assertRaises(sqlite3.OperationalError):
+            writes.close()
+        reader.close()
+        self.assertFalse(writes._flusher.is_alive())
+        with self.assertRaises(RuntimeError):
+            writes.run(insert, 2)
+        self.assertEqual(self.committed(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
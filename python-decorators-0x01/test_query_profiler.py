@@ -0,0 +1,92 @@
+"""Tests for query_profiler.py; run with `python -m unittest` or pytest."""
+import functools
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import db_pool
+import query_profiler
+import slow_queries
+
+
+class FingerprintTest(unittest.TestCase):
+
+    def test_literals_and_in_lists_are_normalized(self):
+        sql = "SELECT * FROM users  WHERE id IN (?, ?, ?) AND name = 'x' -- c"
+        self.assertEqual(query_profiler.fingerprint(sql),
+                         "select * from users where id in (?+) and name = ?")
+
+
+class ArgumentGetterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.tmpdir.name, "users.db")
+        conn = sqlite3.connect(self.database)
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("INSERT INTO users (name) VALUES ('a')")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        router = db_pool._routers.pop(self.database, None)
+        if router is not None:
+            router.close()
+        self.tmpdir.cleanup()
+
+    def test_plain_function(self):
+        def fetch(conn, query, params=()):
+            pass
+        query_of = query_profiler.argument_getter(fetch, "query", 0)
+        params_of = query_profiler.argument_getter(fetch, "params")
+        self.assertEqual(query_of((None, "SELECT 1"), {}), "SELECT 1")
+        self.assertEqual(params_of((None, "SELECT 1"), {"params": (1,)}),
+                         (1,))
+
+    def test_over_a_decorator_passing_everything_through(self):
+        def passthrough(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                return func(*args, **kwargs)
+            return wrapper
+
+        @passthrough
+        def fetch(conn, query):
+            pass
+        query_of = query_profiler.argument_getter(fetch, "query", 0)
+        self.assertEqual(query_of((None, "SELECT 1"), {}), "SELECT 1")
+
+    def test_over_with_db_connection(self):
+        # callers never pass conn, so query is their first argument
+        @db_pool.with_db_connection(database=self.database)
+        def fetch(conn, query, params=()):
+            return conn.execute(query, params).fetchall()
+        query_of = query_profiler.argument_getter(fetch, "query", 0)
+        params_of = query_profiler.argument_getter(fetch, "params")
+        conn_of = query_profiler.argument_getter(fetch, "conn")
+        args = ("SELECT name FROM users WHERE id = ?", (1,))
+        self.assertEqual(query_of(args, {}), args[0])
+        self.assertEqual(params_of(args, {}), (1,))
+        self.assertIsNone(conn_of(args, {}))
+
+    def test_slow_query_log_stacked_over_with_db_connection(self):
+        log = slow_queries.SlowQueryLog(threshold=0, database=self.database)
+
+        @slow_queries.detect_slow_queries(log=log)
+        @db_pool.with_db_connection(read_only=True, database=self.database)
+        def fetch(conn, query, params=()):
+            return conn.execute(query, params).fetchall()
+
+        self.assertEqual(fetch("SELECT name FROM users WHERE id = ?", (1,)),
+                         [("a",)])
+        entry, = log.dump()
+        self.assertEqual(entry["fingerprint"],
+                         "select name from users where id = ?")
+        self.assertEqual(entry["params"], "(1,)")
+        self.assertIn("users", entry["plan"][0])
+        self.assertEqual(entry["full_scan"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,212 @@
+"""Tests for result_cache.py; run with `python -m unittest` or pytest."""
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+import db_pool
+import result_cache
+
+
+def make_database(directory):
+    database = os.path.join(directory, "users.db")
+    conn = sqlite3.connect(database)
+    conn.executescript("""
+        CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE audit (user_id INTEGER);
+        CREATE VIEW named AS SELECT id, name FROM users;
+        CREATE TRIGGER log AFTER UPDATE ON users
+        BEGIN INSERT INTO audit VALUES (new.id); END;
+        INSERT INTO users (name) VALUES ('a'), ('b'), ('c');
+    """)
+    conn.commit()
+    conn.close()
+    return database
+
+
+class TrackTablesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.database = make_database(self.tmpdir.name)
+        self.conn = sqlite3.connect(self.database, factory=db_pool.Connection)
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmpdir.cleanup()
+
+    def tables(self, sql, params=(), conn=None):
+        conn = conn or self.conn
+        with result_cache.track_tables(conn) as (reads, writes):
+            conn.execute(sql, params).fetchall()
+        return reads, writes
+
+    def test_reads_writes_views_and_triggers(self):
+        self.assertEqual(self.tables("SELECT * FROM named"),
+                         ({"named", "users"}, set()))
+        reads, writes = self.tables(
+            "UPDATE users SET name = ? WHERE id = ?", ("x", 1))
+        self.assertEqual(writes, {"users", "audit"})
+
+    def test_cached_statements_are_still_attributed(self):
+        # the second and third runs come from the statement cache and are
+        # not prepared again, so their tables come from the memo
+        for user_id in (1, 2, 3):
+            self.assertEqual(
+                self.tables("SELECT name FROM users WHERE id = ?", (user_id,)),
+                ({"users"}, set()))
+
+    def write(self, cache, sql, params):
+        """What transactional does: track, commit, invalidate"""
+        with result_cache.track_tables(self.conn) as (_, written):
+            self.conn.execute(sql, params)
+        self.conn.commit()
+        cache.invalidate_tables(written)
+        return written
+
+    def test_cached_writes_after_implicit_begin_are_attributed(self):
+        # sqlite3 prepares the UPDATE, then runs its own BEGIN; the
+        # second UPDATE comes from the statement cache
+        cache = result_cache.QueryCache()
+        update = "UPDATE users SET name = ? WHERE id = ?"
+        self.write(cache, update, ("x", 1))
+        self.write(cache, "INSERT INTO audit VALUES (?)", (1,))
+        cache.put("names", ["x"], tables={"users"})
+        self.assertEqual(self.write(cache, update, ("y", 1)),
+                         {"users", "audit"})
+        self.assertEqual(cache.get("names"), (False, None))
+
+    def test_statement_that_never_ran_lends_no_tables(self):
+        with self.assertRaises(sqlite3.ProgrammingError):
+            self.tables("SELECT * FROM audit WHERE user_id = ?", ())
+        self.assertEqual(self.tables("SELECT 1"), (set(), set()))
+
+    def test_hooks_stay_installed_on_attribute_connections(self):
+        self.tables("SELECT * FROM users")
+        state = self.conn._table_tracking
+        self.tables("SELECT * FROM audit")
+        self.assertIs(self.conn._table_tracking, state)
+
+    def test_nested_blocks_both_see_inner_tables(self):
+        with result_cache.track_tables(self.conn) as (outer, _):
+            self.conn.execute("SELECT * FROM audit").fetchall()
+            with result_cache.track_tables(self.conn) as (inner, _):
+                self.conn.execute("SELECT * FROM users").fetchall()
+        self.assertEqual(inner, {"users"})
+        self.assertEqual(outer, {"users", "audit"})
+
+    def test_plain_connections_are_tracked_per_block(self):
+        plain = sqlite3.connect(self.database)
+        self.assertEqual(self.tables("SELECT * FROM users", conn=plain),
+                         ({"users"}, set()))
+        self.assertEqual(result_cache._temporary, {})
+        plain.close()
+
+
+class QueryCacheTest(unittest.TestCase):
+
+    def test_lru_eviction_by_bytes(self):
+        cache = result_cache.QueryCache(max_bytes=300)
+        for key in "abc":
+            cache.put(key, "x" * 100)
+        self.assertEqual(cache.get("a"), (False, None))
+        self.assertEqual(cache.get("c"), (True, "x" * 100))
+        self.assertGreaterEqual(cache.stats()["evictions"], 1)
+
+    def test_ttl_expiry(self):
+        cache = result_cache.QueryCache()
+        cache.put("k", 1, ttl=0.01)
+        time.sleep(0.02)
+        self.assertEqual(cache.get("k"), (False, None))
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_invalidate_tables_drops_dependent_entries(self):
+        cache = result_cache.QueryCache()
+        cache.put("users", 1, tables={"users"})
+        cache.put("audit", 2, tables={"audit"})
+        self.assertEqual(cache.invalidate_tables({"users"}), 1)
+        self.assertEqual(cache.get("users"), (False, None))
+        self.assertEqual(cache.get("audit"), (True, 2))
+
+    def test_put_after_concurrent_write_is_dropped(self):
+        cache = result_cache.QueryCache()
+        generation = cache.generation()
+        cache.invalidate_tables({"users"})
+        self.assertFalse(cache.put("k", 1, {"users"}, generation=generation))
+
+
+class SingleFlightTest(unittest.TestCase):
+
+    def test_concurrent_callers_share_one_load(self):
+        cache = result_cache.QueryCache()
+        loads = []
+        start = threading.Barrier(8)
+
+        def load():
+            loads.append(1)
+            time.sleep(0.05)
+            return 42, {"users"}
+
+        def caller():
+            start.wait()
+            cache.get_or_load("k", load)
+
+        threads = [threading.Thread(target=caller) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        stats = cache.stats()
+        self.assertEqual(len(loads), 1)
+        self.assertEqual((stats["misses"], stats["coalesced"]), (1, 7))
+        self.assertEqual(cache.get_or_load("k", load), ("hit", 42))
+
+    def test_load_error_reaches_every_waiter(self):
+        cache = result_cache.QueryCache()
+        start = threading.Barrier(4)
+        errors = []
+
+        def load():
+            time.sleep(0.05)
+            raise RuntimeError("load failed")
+
+        def caller():
+            start.wait()
+            try:
+                cache.get_or_load("k", load)
+            except RuntimeError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=caller) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(errors), 4)
+        self.assertEqual(cache.get("k"), (False, None))
+
+    def test_async_callers_share_one_load(self):
+        cache = result_cache.QueryCache()
+        loads = []
+
+        async def load():
+            loads.append(1)
+            await asyncio.sleep(0.01)
+            return 42, {"users"}
+
+        async def main():
+            return await asyncio.gather(
+                *(cache.aget_or_load("k", load) for _ in range(8)))
+
+        outcomes = [outcome for outcome, _ in asyncio.run(main())]
+        stats = cache.stats()
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(sorted(set(outcomes)), ["coalesced", "miss"])
+        self.assertEqual((stats["misses"], stats["coalesced"]), (1, 7))
+
+
+if __name__ == "__main__":
+    unittest.main()
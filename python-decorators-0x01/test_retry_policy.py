@@ -0,0 +1,96 @@
+"""Tests for retry_policy.py; run with `python -m unittest` or pytest."""
+import random
+import sqlite3
+import time
+import unittest
+
+import retry_policy
+
+
+class BackoffTest(unittest.TestCase):
+
+    def test_window_doubles_up_to_the_cap(self):
+        random.seed(0)
+        for attempt, window in ((1, 1), (2, 2), (3, 4), (4, 8), (6, 10)):
+            pauses = [retry_policy.backoff(attempt, 1, 10)
+                      for _ in range(200)]
+            self.assertTrue(all(0 <= p < window for p in pauses))
+            # full jitter: spread over the whole window, not bunched
+            self.assertGreater(max(pauses), window * 0.8)
+            self.assertLess(min(pauses), window * 0.2)
+
+
+class IsTransientTest(unittest.TestCase):
+
+    def test_locked_is_transient_and_readonly_is_not(self):
+        self.assertTrue(retry_policy.is_transient(
+            sqlite3.OperationalError("database is locked")))
+        for message in ("attempt to write a readonly database",
+                        "no such table: users", 'near "SELEC": syntax error'):
+            self.assertFalse(retry_policy.is_transient(
+                sqlite3.OperationalError(message)))
+
+
+class RetryBudgetTest(unittest.TestCase):
+
+    def test_tokens_are_earned_per_call_and_capped(self):
+        budget = retry_policy.RetryBudget(ratio=0.5, max_tokens=2)
+        self.assertTrue(budget.take_retry())
+        self.assertTrue(budget.take_retry())
+        self.assertFalse(budget.take_retry())
+        budget.start_call()
+        self.assertFalse(budget.take_retry())  # 0.5 tokens
+        budget.start_call()
+        self.assertTrue(budget.take_retry())
+        for _ in range(10):
+            budget.start_call()
+        self.assertEqual(budget.stats()["tokens"], 2)
+        self.assertEqual(budget.stats()["budget_exhausted"], 2)
+
+    def trip(self, budget):
+        for _ in range(budget.trip_after):
+            budget.start_call()
+            budget.gave_up()
+
+    def test_breaker_opens_after_trip_after_give_ups(self):
+        budget = retry_policy.RetryBudget(trip_after=3, cooldown=60)
+        self.trip(budget)
+        with self.assertRaises(retry_policy.CircuitOpen):
+            budget.start_call()
+        stats = budget.stats()
+        self.assertEqual((stats["trips"], stats["short_circuited"]), (1, 1))
+        self.assertTrue(stats["open"])
+
+    def test_half_open_admits_a_single_probe(self):
+        budget = retry_policy.RetryBudget(trip_after=2, cooldown=0.05)
+        self.trip(budget)
+        time.sleep(0.06)
+        budget.start_call()  # the probe
+        with self.assertRaises(retry_policy.CircuitOpen):
+            budget.start_call()
+        budget.succeeded()
+        budget.start_call()
+        budget.start_call()
+        self.assertEqual(budget.stats()["probes"], 1)
+
+    def test_failed_probe_reopens_the_breaker(self):
+        budget = retry_policy.RetryBudget(trip_after=2, cooldown=0.05)
+        self.trip(budget)
+        time.sleep(0.06)
+        budget.start_call()
+        budget.gave_up()
+        with self.assertRaises(retry_policy.CircuitOpen):
+            budget.start_call()
+
+    def test_probe_that_never_reports_back_is_replaced(self):
+        budget = retry_policy.RetryBudget(trip_after=2, cooldown=0.05)
+        self.trip(budget)
+        time.sleep(0.06)
+        budget.start_call()  # raises something that is not retried
+        time.sleep(0.06)
+        budget.start_call()
+        self.assertEqual(budget.stats()["probes"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""Tests for slow_queries.py; run with `python -m unittest` or pytest."""
+import sqlite3
+import unittest
+
+import slow_queries
+
+
+class ScannedTablesTest(unittest.TestCase):
+
+    def plan(self, sql):
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT)")
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        conn.close()
+        return [row[3] for row in rows]
+
+    def test_full_scan_is_reported(self):
+        self.assertEqual(slow_queries.scanned_tables(
+            self.plan("SELECT * FROM users WHERE name = 'a'")), ["users"])
+        self.assertEqual(slow_queries.scanned_tables(
+            ["SCAN TABLE users"]), ["users"])
+
+    def test_index_lookups_are_not(self):
+        self.assertEqual(slow_queries.scanned_tables(
+            self.plan("SELECT * FROM users WHERE id = 1")), [])
+
+    def test_constant_rows_and_subqueries_are_not_tables(self):
+        self.assertEqual(slow_queries.scanned_tables(
+            self.plan("SELECT 1")), [])
+        self.assertEqual(slow_queries.scanned_tables(
+            ["SCAN SUBQUERY 1", "SCAN (subquery-2)"]), [])
+        plan = self.plan("WITH t AS MATERIALIZED (SELECT name FROM users) "
+                         "SELECT * FROM t")
+        self.assertEqual(slow_queries.scanned_tables(plan), ["users"])
+
+
+class SlowQueryLogTest(unittest.TestCase):
+
+    def record(self, log, sql, seconds):
+        entry, needs_plan = log._entry(sql, seconds)
+        if entry is not None:
+            log._update(entry, None, seconds)
+        return entry, needs_plan
+
+    def test_repeat_fingerprint_needs_no_new_plan(self):
+        log = slow_queries.SlowQueryLog(top_n=5)
+        self.assertTrue(self.record(log, "SELECT * FROM users WHERE id = 1",
+                                    0.2)[1])
+        self.assertFalse(self.record(log, "SELECT * FROM users WHERE id = 2",
+                                     0.3)[1])
+        entry, = log.dump()
+        self.assertEqual((entry["count"], entry["max_seconds"]), (2, 0.3))
+
+    def test_full_log_evicts_before_inserting(self):
+        log = slow_queries.SlowQueryLog(top_n=2)
+        self.record(log, "SELECT * FROM a", 0.5)
+        self.record(log, "SELECT * FROM b", 0.2)
+        # faster than everything kept: not stored, so not explained again
+        self.assertEqual(self.record(log, "SELECT * FROM c", 0.1),
+                         (None, False))
+        entry, needs_plan = self.record(log, "SELECT * FROM d", 0.3)
+        self.assertTrue(needs_plan)
+        self.assertEqual([e["sql"] for e in log.dump()],
+                         ["SELECT * FROM a", "SELECT * FROM d"])
+
+
+if __name__ == "__main__":
+    unittest.main()
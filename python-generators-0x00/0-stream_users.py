@@ -1,24 +1,40 @@
 #!/usr/bin/python3
-import mysql.connector
+db_pool = __import__('db_pool')
 
+PREFETCH = 1000
 
-def stream_users():
+
+def stream_users(stream=False, prefetch=PREFETCH, limit=None):
     """
     Generator that streams rows from user_data table one by one.
     Yields rows as dictionaries.
+
+    Both paths use an unbuffered cursor (mysql-connector's default), so
+    client memory stays flat however large the table is. stream=True
+    only changes how rows are pulled: `prefetch` at a time with
+    fetchmany instead of one per iteration step.
     """
-    connection = mysql.connector.connect(
-        host="localhost",
-        user="Benose13",         
-        password="Iamhead-11",     
-        database="ALX_prodev"
-    )
-    cursor = connection.cursor(dictionary=True)
+    query = "SELECT user_id, name, email, age FROM user_data"
+    if limit is not None:
+        query += f" LIMIT {int(limit)}"
+
+    with db_pool.connection() as connection:
+        if stream:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(query)
+            while True:
+                rows = cursor.fetchmany(prefetch)
+                if not rows:
+                    break
+                yield from rows
+            cursor.close()
+            return
+
+        cursor = connection.cursor(dictionary=True)
 
-    cursor.execute("SELECT * FROM user_data")
+        cursor.execute(query)
 
-    for row in cursor:   # only one loop
-        yield row
+        for row in cursor:   # only one loop
+            yield row
 
-    cursor.close()
-    connection.close()
+        cursor.close()
@@ -1,30 +1,74 @@
 #!/usr/bin/python3
-import mysql.connector
+from array import array
+db_pool = __import__('db_pool')
+pushdown = __import__('pushdown')
 
-def stream_users_in_batches(batch_size):
-    """Generator to stream users from DB in batches"""
-    connection = mysql.connector.connect(
-        host="localhost",
-        user="Benose13",
-        password="Iamhead-11",  
-        database="ALX_prodev"
-    )
-    cursor = connection.cursor(dictionary=True)
+COLUMNS = ("user_id", "name", "email", "age")
+ROW_FORMATS = ("dict", "tuple", "columnar")
 
-    cursor.execute("SELECT * FROM user_data")
-    while True:
-        rows = cursor.fetchmany(batch_size)
-        if not rows:
-            break
-        yield rows
 
-    cursor.close()
-    connection.close()
+def to_columns(rows):
+    """Turn a list of row tuples into {column: values}.
+
+    age becomes an array('d'), so numpy.frombuffer(batch["age"]) gives
+    a vector without copying; the text columns stay lists of str.
+    """
+    user_ids, names, emails, ages = zip(*rows) if rows else ((),) * 4
+    return {
+        "user_id": list(user_ids),
+        "name": list(names),
+        "email": list(emails),
+        "age": array("d", ages),
+    }
+
+
+def last_user_id(batch, row_format="dict"):
+    """user_id of the final row of a batch in any row_format"""
+    if row_format == "columnar":
+        return batch["user_id"][-1]
+    if row_format == "tuple":
+        return batch[-1][0]
+    return batch[-1]["user_id"]
+
+
+def stream_users_in_batches(batch_size, row_format="dict",
+                            after_user_id=None, ordered=False):
+    """Generator to stream users from DB in batches
+
+    row_format picks the batch shape: "dict" (a dict per row),
+    "tuple" (plain tuples in COLUMNS order) or "columnar" (one
+    dict of per-column sequences per batch, see to_columns).
+
+    ordered=True returns rows in user_id order; after_user_id (which
+    implies ordered) starts just past that key, so a scan can resume.
+    """
+    if row_format not in ROW_FORMATS:
+        raise ValueError(f"row_format must be one of {ROW_FORMATS}")
+    query = f"SELECT {', '.join(COLUMNS)} FROM user_data"
+    params = ()
+    if after_user_id is not None:
+        query += " WHERE user_id > %s"
+        params = (after_user_id,)
+    if ordered or after_user_id is not None:
+        query += " ORDER BY user_id"
+
+    with db_pool.connection() as connection:
+        cursor = connection.cursor(dictionary=row_format == "dict")
+
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield to_columns(rows) if row_format == "columnar" else rows
+
+        cursor.close()
 
 
 def batch_processing(batch_size):
     """Process each batch to filter users over age 25"""
-    for batch in stream_users_in_batches(batch_size):  # loop 1
+    # the age filter runs in SQL, so only matching rows are fetched
+    query = pushdown.Query().where("age", ">", 25)
+    for batch in query.batches(batch_size):  # loop 1
         for user in batch:  # loop 2
-            if user["age"] > 25:  # filtering, no loop
-                print(user)
+            print(user)
@@ -1,23 +1,91 @@
 #!/usr/bin/python3
-seed = __import__('seed')
+import base64
+db_pool = __import__('db_pool')
 
 
-def paginate_users(page_size, offset):
+def paginate_users(page_size, offset, connection=None):
     """Fetch one page of users starting from offset"""
-    connection = seed.connect_to_prodev()
+    if connection is None:
+        with db_pool.connection() as connection:
+            return paginate_users(page_size, offset, connection)
     cursor = connection.cursor(dictionary=True)
-    cursor.execute(f"SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}")
+    cursor.execute(
+        f"SELECT user_id, name, email, age FROM user_data "
+        f"LIMIT {page_size} OFFSET {offset}")
     rows = cursor.fetchall()
-    connection.close()
+    cursor.close()
     return rows
 
 
-def lazy_pagination(page_size):
-    """Generator to lazily paginate through users"""
-    offset = 0
-    while True:  # only ONE loop
-        page = paginate_users(page_size, offset)
-        if not page:
-            break
-        yield page
-        offset += page_size
+def paginate_users_after(page_size, last_user_id=None, connection=None):
+    """Fetch the page of users that follows last_user_id (keyset/seek).
+
+    Seeks straight to the key through the primary key index, so every
+    page costs the same no matter how deep into the table it is.
+    """
+    if connection is None:
+        with db_pool.connection() as connection:
+            return paginate_users_after(page_size, last_user_id, connection)
+    cursor = connection.cursor(dictionary=True)
+    if last_user_id is None:
+        cursor.execute(
+            "SELECT user_id, name, email, age FROM user_data "
+            "ORDER BY user_id LIMIT %s",
+            (page_size,)
+        )
+    else:
+        cursor.execute(
+            "SELECT user_id, name, email, age FROM user_data "
+            "WHERE user_id > %s "
+            "ORDER BY user_id LIMIT %s",
+            (last_user_id, page_size)
+        )
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+
+def encode_cursor(user_id):
+    """Turn the last user_id of a page into an opaque resume token"""
+    return base64.urlsafe_b64encode(user_id.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(token):
+    """Turn a resume token back into the user_id to seek after"""
+    return base64.urlsafe_b64decode(token.encode("ascii")).decode("utf-8")
+
+
+def page_cursor(page):
+    """Resume token pointing just past the given page"""
+    return encode_cursor(page[-1]["user_id"]) if page else None
+
+
+def lazy_pagination(page_size, keyset=False, cursor=None):
+    """Generator to lazily paginate through users
+
+    With keyset=True pages are ordered by user_id and fetched with a
+    seek instead of OFFSET; pass cursor=page_cursor(page) to resume
+    after a page yielded by an earlier walk. One pooled connection is
+    held for the whole walk.
+    """
+    if cursor is not None and not keyset:
+        raise ValueError("cursor tokens only apply with keyset=True")
+    with db_pool.connection() as connection:
+        if keyset:
+            last_user_id = decode_cursor(cursor) if cursor else None
+            while True:
+                page = paginate_users_after(
+                    page_size, last_user_id, connection)
+                if not page:
+                    break
+                yield page
+                last_user_id = page[-1]["user_id"]
+            return
+
+        offset = 0
+        while True:  # only ONE loop
+            page = paginate_users(page_size, offset, connection)
+            if not page:
+                break
+            yield page
+            offset += page_size
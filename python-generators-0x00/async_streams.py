@@ -0,0 +1,187 @@
+#!/usr/bin/python3
+"""asyncio counterparts of the user_data generators.
+
+Consume them with `async for`. The next batch is always requested
+before the current one is handed out, so the database round trip
+overlaps whatever the caller does with the rows. The driver follows
+PRODEV_BACKEND: aiomysql for MySQL (server-side cursor), aiosqlite
+for SQLite.
+
+    async for user in async_stream_users():
+        ...
+"""
+import asyncio
+import contextlib
+
+from backends import get_backend
+
+try:
+    import aiomysql
+except ImportError:
+    aiomysql = None
+try:
+    import aiosqlite
+except ImportError:
+    aiosqlite = None
+
+BATCH_SIZE = 1000
+SELECT_USERS = "SELECT user_id, name, email, age FROM user_data"
+
+
+class _MySQLCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    async def fetchmany(self, size):
+        return await self._cursor.fetchmany(size)
+
+    async def close(self):
+        await self._cursor.close()
+
+
+class _SQLiteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    async def fetchmany(self, size):
+        return [dict(row) for row in await self._cursor.fetchmany(size)]
+
+    async def close(self):
+        await self._cursor.close()
+
+
+class _MySQLConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    async def execute(self, query, params=()):
+        # unbuffered: rows stay on the server until fetched
+        cursor = await self._conn.cursor(aiomysql.SSDictCursor)
+        await cursor.execute(query, params)
+        return _MySQLCursor(cursor)
+
+
+class _SQLiteConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    async def execute(self, query, params=()):
+        cursor = await self._conn.execute(query.replace("%s", "?"), params)
+        return _SQLiteCursor(cursor)
+
+
+@contextlib.asynccontextmanager
+async def connect():
+    """Open an async connection to user_data for the active backend"""
+    backend = get_backend()
+    if backend.name == "sqlite":
+        if aiosqlite is None:
+            raise RuntimeError("async streams on SQLite need aiosqlite")
+        async with aiosqlite.connect(backend.path) as conn:
+            conn.row_factory = aiosqlite.Row
+            yield _SQLiteConnection(conn)
+    else:
+        if aiomysql is None:
+            raise RuntimeError("async streams on MySQL need aiomysql")
+        config = backend.config(database=True)
+        config["db"] = config.pop("database")
+        conn = await aiomysql.connect(**config)
+        try:
+            yield _MySQLConnection(conn)
+        finally:
+            conn.close()
+
+
+async def _batches(db, query, params=(), batch_size=BATCH_SIZE):
+    """Yield fetchmany batches, keeping the next fetch in flight"""
+    cursor = await db.execute(query, params)
+    pending = asyncio.ensure_future(cursor.fetchmany(batch_size))
+    try:
+        while True:
+            rows = await pending
+            if not rows:
+                break
+            pending = asyncio.ensure_future(cursor.fetchmany(batch_size))
+            yield rows
+    finally:
+        # let an in-flight fetch land before the cursor goes away
+        await asyncio.gather(pending, return_exceptions=True)
+        await cursor.close()
+
+
+async def _fetch_page(db, query, params):
+    cursor = await db.execute(query, params)
+    try:
+        rows = []
+        while True:
+            batch = await cursor.fetchmany(BATCH_SIZE)
+            if not batch:
+                return rows
+            rows.extend(batch)
+    finally:
+        await cursor.close()
+
+
+@contextlib.asynccontextmanager
+async def _scan(query, batch_size):
+    """Connection plus batch iterator, both closed on exit"""
+    async with connect() as db:
+        async with contextlib.aclosing(
+                _batches(db, query, (), batch_size)) as batches:
+            yield batches
+
+
+async def async_stream_users(batch_size=BATCH_SIZE):
+    """Async generator of user_data rows (dicts), one at a time"""
+    async with _scan(SELECT_USERS, batch_size) as batches:
+        async for rows in batches:
+            for row in rows:
+                yield row
+
+
+async def async_stream_users_in_batches(batch_size):
+    """Async generator of lists of at most batch_size user rows"""
+    async with _scan(SELECT_USERS, batch_size) as batches:
+        async for rows in batches:
+            yield rows
+
+
+async def async_lazy_pagination(page_size, keyset=True):
+    """Async generator of pages; the next page is fetched in advance.
+
+    keyset=True seeks by user_id like lazy_pagination(keyset=True);
+    keyset=False pages with LIMIT/OFFSET.
+    """
+    def page_query(last_user_id, offset):
+        if not keyset:
+            return (SELECT_USERS + " LIMIT %s OFFSET %s",
+                    (page_size, offset))
+        if last_user_id is None:
+            return (SELECT_USERS + " ORDER BY user_id LIMIT %s",
+                    (page_size,))
+        return (SELECT_USERS + " WHERE user_id > %s "
+                "ORDER BY user_id LIMIT %s", (last_user_id, page_size))
+
+    async with connect() as db:
+        offset = 0
+        pending = asyncio.ensure_future(
+            _fetch_page(db, *page_query(None, offset)))
+        try:
+            while True:
+                page = await pending
+                if not page:
+                    break
+                offset += page_size
+                pending = asyncio.ensure_future(
+                    _fetch_page(db, *page_query(page[-1]["user_id"], offset)))
+                yield page
+        finally:
+            await asyncio.gather(pending, return_exceptions=True)
+
+
+async def async_stream_user_ages(batch_size=BATCH_SIZE):
+    """Async generator of user ages"""
+    async with _scan("SELECT age FROM user_data", batch_size) as batches:
+        async for rows in batches:
+            for row in rows:
+                yield row["age"]
@@ -0,0 +1,304 @@
+#!/usr/bin/python3
+"""Database backends for the generator scripts.
+
+PRODEV_BACKEND picks the implementation: "mysql" (default) talks to
+the server described by the MYSQL_* variables, "sqlite" uses a local
+file (PRODEV_SQLITE_PATH) so the same generators run without a server.
+
+The SQLite connection is wrapped so it accepts the mysql-connector
+calls used across this package: "%s" placeholders,
+cursor(dictionary=True, buffered=False), fetchmany, ping and
+is_connected.
+"""
+import math
+import os
+import queue
+import sqlite3
+import threading
+
+try:
+    import mysql.connector
+    from mysql.connector import pooling
+except ImportError:  # SQLite-only environments
+    mysql = None
+
+DB_NAME = os.environ.get("MYSQL_DATABASE", "ALX_prodev")
+
+# catch-all for either driver, e.g. `except Error as e`
+Error = (sqlite3.Error,) + ((mysql.connector.Error,) if mysql else ())
+
+
+class MySQLBackend:
+    """mysql-connector backed user_data"""
+
+    name = "mysql"
+    insert_ignore = "INSERT IGNORE"
+    upsert_users = (
+        "INSERT INTO user_data (user_id, name, email, age) "
+        "VALUES (%s, %s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE name = VALUES(name), age = VALUES(age)"
+    )
+
+    def config(self, database=False):
+        """Connection settings, read from the MYSQL_* environment variables."""
+        config = {
+            "host": os.environ.get("MYSQL_HOST", "localhost"),
+            "port": int(os.environ.get("MYSQL_PORT", "3306")),
+            "user": os.environ.get("MYSQL_USER", "root"),
+            "password": os.environ.get("MYSQL_PASSWORD", ""),
+        }
+        if database:
+            config["database"] = DB_NAME
+        return config
+
+    def connect(self, database=True):
+        return mysql.connector.connect(**self.config(database))
+
+    def create_pool(self, name, size):
+        return pooling.MySQLConnectionPool(
+            pool_name=name,
+            pool_size=size,
+            pool_reset_session=True,
+            # drain half-read generators before the connection is reused
+            consume_results=True,
+            **self.config(database=True)
+        )
+
+    def create_database(self, connection):
+        cursor = connection.cursor()
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_NAME}")
+        cursor.close()
+
+    def create_table(self, connection):
+        cursor = connection.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS user_data (
+                user_id CHAR(36) PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                email VARCHAR(255) NOT NULL,
+                age DECIMAL NOT NULL,
+                seq BIGINT NOT NULL AUTO_INCREMENT UNIQUE,
+                INDEX(user_id),
+                UNIQUE INDEX uniq_email (email)
+            )
+        """)
+        cursor.close()
+
+    def has_index(self, connection, table, index):
+        return self._exists(
+            connection,
+            "SELECT COUNT(*) FROM INFORMATION_SCHEMA.STATISTICS "
+            "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND INDEX_NAME = %s",
+            (DB_NAME, table, index)
+        )
+
+    def has_column(self, connection, table, column):
+        return self._exists(
+            connection,
+            "SELECT COUNT(*) FROM INFORMATION_SCHEMA.COLUMNS "
+            "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+            (DB_NAME, table, column)
+        )
+
+    def _exists(self, connection, query, params):
+        cursor = connection.cursor()
+        cursor.execute(query, params)
+        (count,) = cursor.fetchone()
+        cursor.close()
+        return count > 0
+
+
+class SQLiteCursor:
+    """DB-API cursor speaking the mysql-connector dialect used here"""
+
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    @staticmethod
+    def _sql(query):
+        return query.replace("%s", "?")
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip(self.column_names, row))
+
+    @property
+    def column_names(self):
+        return tuple(d[0] for d in self._cursor.description or ())
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def execute(self, query, params=()):
+        self._cursor.execute(self._sql(query), params)
+        return self
+
+    def executemany(self, query, seq_of_params):
+        self._cursor.executemany(self._sql(query), seq_of_params)
+        return self
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        rows = self._cursor.fetchmany(size)
+        return [self._row(r) for r in rows] if self._dictionary else rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        return [self._row(r) for r in rows] if self._dictionary else rows
+
+    def __iter__(self):
+        return (self._row(r) for r in self._cursor)
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """sqlite3 connection with the mysql-connector methods used here"""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # MySQL has FLOOR built in; older SQLite builds do not
+        self._conn.create_function("FLOOR", 1, math.floor, deterministic=True)
+
+    def cursor(self, dictionary=False, buffered=None):
+        # sqlite3 cursors already step rows lazily, so buffered is moot
+        return SQLiteCursor(self._conn.cursor(), dictionary)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def is_connected(self):
+        return True
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        pass
+
+    def close(self):
+        self._conn.close()
+
+
+class SQLitePool:
+    """Fixed-size pool of SQLite connections, same shape as MySQL's"""
+
+    def __init__(self, path, size):
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._path = path
+        self._size = size
+        self._created = 0
+
+    def get_connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._created >= self._size:
+                    conn = None
+                else:
+                    self._created += 1
+                    conn = SQLiteConnection(self._path)
+            if conn is None:
+                conn = self._idle.get()
+        return PooledSQLiteConnection(self, conn)
+
+    def _release(self, conn):
+        conn.rollback()
+        self._idle.put(conn)
+
+
+class PooledSQLiteConnection:
+    """Borrowed connection; close() hands it back to the pool"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is not None:
+            self._pool._release(self._conn)
+            self._conn = None
+
+
+class SQLiteBackend:
+    """Local-file stand-in for the MySQL server"""
+
+    name = "sqlite"
+    insert_ignore = "INSERT OR IGNORE"
+    upsert_users = (
+        "INSERT INTO user_data (user_id, name, email, age) "
+        "VALUES (%s, %s, %s, %s) "
+        "ON CONFLICT (email) DO UPDATE SET name = excluded.name, age = excluded.age"
+    )
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get(
+            "PRODEV_SQLITE_PATH", f"{DB_NAME}.sqlite3")
+
+    def connect(self, database=True):
+        return SQLiteConnection(self.path)
+
+    def create_pool(self, name, size):
+        return SQLitePool(self.path, size)
+
+    def create_database(self, connection):
+        pass  # the file is the database
+
+    def create_table(self, connection):
+        cursor = connection.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS user_data (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL UNIQUE,
+                name TEXT NOT NULL,
+                email TEXT NOT NULL,
+                age NUMERIC NOT NULL
+            )
+        """)
+        cursor.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uniq_email ON user_data (email)")
+        cursor.close()
+
+    def has_index(self, connection, table, index):
+        cursor = connection.cursor()
+        cursor.execute(f"PRAGMA index_list({table})")
+        names = [row[1] for row in cursor.fetchall()]
+        cursor.close()
+        return index in names
+
+    def has_column(self, connection, table, column):
+        cursor = connection.cursor()
+        cursor.execute(f"PRAGMA table_info({table})")
+        names = [row[1] for row in cursor.fetchall()]
+        cursor.close()
+        return column in names
+
+
+BACKENDS = {"mysql": MySQLBackend, "sqlite": SQLiteBackend}
+_backend = None
+
+
+def get_backend():
+    """Backend selected by PRODEV_BACKEND, created once per process"""
+    global _backend
+    if _backend is None:
+        name = os.environ.get("PRODEV_BACKEND", "mysql")
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown PRODEV_BACKEND: {name}")
+        _backend = BACKENDS[name]()
+    return _backend
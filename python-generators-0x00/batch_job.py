@@ -0,0 +1,151 @@
+#!/usr/bin/python3
+"""Restartable jobs over stream_users_in_batches.
+
+The scan runs in user_id order and, after each batch has been
+processed, the batch's last user_id is saved to a checkpoint store.
+If the job dies, the next run with the same name picks up right after
+that key instead of starting again from row zero.
+
+    def export(batch):
+        ...
+
+    run_batch_job("export", export, store=FileCheckpointStore("jobs.json"))
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+batches = __import__('1-batch_processing')
+pushdown = __import__('pushdown')
+
+BATCH_SIZE = 1000
+REPORT_EVERY = 10.0  # seconds
+
+
+class FileCheckpointStore:
+    """Checkpoints for all jobs in one JSON file, rewritten atomically"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write(self, jobs):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(jobs, f)
+        os.replace(tmp, self.path)
+
+    def load(self, job):
+        """(last_user_id, rows_done) for job, or (None, 0)"""
+        entry = self._read().get(job)
+        return (entry["last_user_id"], entry["rows_done"]) if entry \
+            else (None, 0)
+
+    def save(self, job, last_user_id, rows_done):
+        with self._lock:
+            jobs = self._read()
+            jobs[job] = {"last_user_id": last_user_id,
+                         "rows_done": rows_done,
+                         "updated_at": time.time()}
+            self._write(jobs)
+
+    def clear(self, job):
+        with self._lock:
+            jobs = self._read()
+            if jobs.pop(job, None) is not None:
+                self._write(jobs)
+
+
+class SQLiteCheckpointStore:
+    """Checkpoints kept in a local SQLite file"""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                job TEXT PRIMARY KEY,
+                last_user_id TEXT,
+                rows_done INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def load(self, job):
+        """(last_user_id, rows_done) for job, or (None, 0)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_user_id, rows_done FROM checkpoints WHERE job = ?",
+                (job,)
+            ).fetchone()
+        return row if row else (None, 0)
+
+    def save(self, job, last_user_id, rows_done):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints "
+                "(job, last_user_id, rows_done, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (job, last_user_id, rows_done, time.time())
+            )
+
+    def clear(self, job):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM checkpoints WHERE job = ?", (job,))
+
+    def close(self):
+        self._conn.close()
+
+
+def _report(job, done, processed, remaining, elapsed):
+    rate = processed / elapsed if elapsed else 0
+    eta = f"{remaining / rate:.0f}s" if rate else "?"
+    print(f"[{job}] {done} rows done, {rate:.0f} rows/s, "
+          f"{remaining} left, ETA {eta}")
+
+
+def run_batch_job(job, process, store, batch_size=BATCH_SIZE,
+                  row_format="dict", report_every=REPORT_EVERY):
+    """Run process(batch) over every user row, resuming from store.
+
+    The checkpoint only moves after process() returns, so a batch that
+    was interrupted is processed again on restart (at-least-once). When
+    the scan finishes the checkpoint is cleared and the total number of
+    rows processed across all runs is returned.
+    """
+    last, done = store.load(job)
+    remaining_query = pushdown.Query()
+    if last is not None:
+        remaining_query = remaining_query.where("user_id", ">", last)
+        print(f"[{job}] resuming after {last} ({done} rows already done)")
+    remaining = remaining_query.count()
+
+    start = last_report = time.perf_counter()
+    processed = 0
+    for batch in batches.stream_users_in_batches(
+            batch_size, row_format, after_user_id=last, ordered=True):
+        process(batch)
+        size = len(batch["user_id"]) if row_format == "columnar" else len(batch)
+        last = batches.last_user_id(batch, row_format)
+        done += size
+        processed += size
+        remaining = max(0, remaining - size)
+        store.save(job, last, done)
+
+        now = time.perf_counter()
+        if now - last_report >= report_every:
+            _report(job, done, processed, remaining, now - start)
+            last_report = now
+
+    _report(job, done, processed, remaining, time.perf_counter() - start)
+    store.clear(job)
+    return done
@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+"""Run the generator code paths against each backend and time them.
+
+    ./bench_backends.py [rows|tier] [backend ...]
+
+Each backend runs in its own interpreter with PRODEV_BACKEND set.
+MySQL uses the ALX_prodev_bench database and SQLite a temporary file,
+so the real ALX_prodev data is never touched.
+"""
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import datagen
+
+ROWS = 100_000
+BACKENDS = ("sqlite", "mysql")
+BENCH_DB = "ALX_prodev_bench"
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28} {elapsed:>8.2f}s  {result}")
+
+
+def run_backend(rows, csv_path):
+    """Load the dataset and time each generator (runs in the child)"""
+    seed = __import__('seed')
+    stream_users = __import__('0-stream_users').stream_users
+    lazy_pagination = __import__('2-lazy_paginate').lazy_pagination
+    pushdown = __import__('pushdown')
+
+    connection = seed.connect_db()
+    seed.create_database(connection)
+    connection.close()
+    connection = seed.connect_to_prodev()
+    seed.create_table(connection)
+    cursor = connection.cursor()
+    cursor.execute("DELETE FROM user_data")
+    connection.commit()
+    cursor.close()
+
+    print(f"{os.environ['PRODEV_BACKEND']} ({rows} rows)")
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        seed.insert_data_bulk(connection, csv_path)
+        load = time.perf_counter() - start
+    print(f"  {'insert_data_bulk':<28} {load:>8.2f}s")
+    connection.close()
+
+    timed("stream_users", lambda: sum(1 for _ in stream_users()))
+    timed("stream_users(stream=True)",
+          lambda: sum(1 for _ in stream_users(stream=True)))
+    timed("lazy_pagination(keyset)",
+          lambda: sum(len(p) for p in lazy_pagination(1000, keyset=True)))
+    timed("batches(age > 25)", lambda: sum(
+        len(b) for b in pushdown.Query().where("age", ">", 25).batches(1000)))
+    timed("avg(age)", lambda: round(pushdown.Query().avg("age"), 2))
+
+
+def main(rows, backends):
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "users.csv")
+        datagen.write_csv(csv_path, rows)
+        for backend in backends:
+            env = dict(os.environ, PRODEV_BACKEND=backend,
+                       MYSQL_DATABASE=BENCH_DB,
+                       PRODEV_SQLITE_PATH=os.path.join(tmp, "bench.sqlite3"))
+            subprocess.run([sys.executable, __file__, "--child",
+                            str(rows), csv_path], env=env, check=False)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        run_backend(int(sys.argv[2]), sys.argv[3])
+    else:
+        rows = datagen.tier_rows(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+        main(rows, sys.argv[2:] or BACKENDS)
@@ -0,0 +1,34 @@
+#!/usr/bin/python3
+"""Throughput of partitioned_scan against the single-cursor stream_users.
+
+    ./bench_partitioned_scan.py [partitions ...]
+
+Set PRODEV_POOL_SIZE to at least the largest partition count.
+"""
+import sys
+import time
+
+stream_users = __import__('0-stream_users').stream_users
+partitioned_scan = __import__('partitioned_scan').partitioned_scan
+
+PARTITIONS = (2, 4, 8)
+
+
+def timed(label, rows):
+    """Consume an iterator and print rows/second"""
+    start = time.perf_counter()
+    count = sum(1 for _ in rows)
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed else 0
+    print(f"{label:<24} {count:>10} rows {elapsed:>8.2f}s {rate:>12.0f} rows/s")
+
+
+def main(partitions):
+    timed("stream_users", stream_users())
+    for n in partitions:
+        timed(f"partitioned x{n} unordered", partitioned_scan(n))
+        timed(f"partitioned x{n} ordered", partitioned_scan(n, ordered=True))
+
+
+if __name__ == "__main__":
+    main([int(n) for n in sys.argv[1:]] or PARTITIONS)
@@ -0,0 +1,56 @@
+#!/usr/bin/python3
+"""Peak RSS of stream_users, row-at-a-time vs fetchmany, at growing sizes.
+
+Both modes read through an unbuffered cursor, so this is expected to
+show the same flat peak for each and only a speed difference; it is
+here to confirm that memory does not grow with the row count.
+
+Each measurement runs in a fresh interpreter so ru_maxrss is not
+polluted by earlier runs. The user_data table must already hold at
+least the largest size requested, e.g. `./datagen.py large --load`.
+
+    ./bench_stream_memory.py 10000 100000 1000000 10000000
+"""
+import resource
+import subprocess
+import sys
+import time
+
+SIZES = (10_000, 100_000, 1_000_000, 10_000_000)
+
+
+def measure(stream, size):
+    """Consume `size` rows in this process, return (rows, seconds, KiB)"""
+    stream_users = __import__('0-stream_users').stream_users
+    start = time.perf_counter()
+    count = 0
+    for _ in stream_users(stream=stream, limit=size):
+        count += 1
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return count, elapsed, peak
+
+
+def run_child(stream, size):
+    """Run one measurement in a subprocess and parse its result"""
+    out = subprocess.run(
+        [sys.executable, __file__, "--child", str(int(stream)), str(size)],
+        check=True, capture_output=True, text=True
+    ).stdout.split()
+    return int(out[0]), float(out[1]), int(out[2])
+
+
+def main(sizes):
+    print(f"{'rows':>10} {'mode':>9} {'seconds':>8} {'peak MiB':>9}")
+    for size in sizes:
+        for stream in (False, True):
+            count, elapsed, peak = run_child(stream, size)
+            mode = "fetchmany" if stream else "per-row"
+            print(f"{count:>10} {mode:>9} {elapsed:>8.2f} {peak / 1024:>9.1f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        print(*measure(bool(int(sys.argv[2])), int(sys.argv[3])))
+    else:
+        main([int(n) for n in sys.argv[1:]] or SIZES)
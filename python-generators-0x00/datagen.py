@@ -0,0 +1,189 @@
+#!/usr/bin/python3
+"""Deterministic synthetic user_data generator for scale tests.
+
+Rows are produced lazily, so any size can be streamed to a CSV file
+(gzip if the name ends in .gz), a Parquet file (needs pyarrow) or
+straight into seed.insert_rows_bulk without being held in memory.
+The same seed always yields the same rows.
+
+    ./datagen.py small --out users.csv.gz
+    ./datagen.py 2500000 --load --dup-rate 0.02
+"""
+import argparse
+import csv
+import gzip
+import itertools
+import random
+
+import seed as seed_db
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+TIERS = {
+    "tiny": 1_000,
+    "small": 100_000,
+    "medium": 1_000_000,
+    "large": 10_000_000,
+}
+DUP_RATE = 0.01
+CHUNK_SIZE = 5000
+
+FIRST_NAMES = (
+    "Ada", "Alan", "Amara", "Ana", "Ben", "Carlos", "Chen", "Chloe",
+    "Dana", "David", "Elena", "Emeka", "Fatima", "Felix", "Grace", "Hana",
+    "Hugo", "Ibrahim", "Ines", "Jack", "Jin", "Kofi", "Lara", "Leo",
+    "Maria", "Mei", "Nia", "Noah", "Olga", "Omar", "Priya", "Ravi",
+    "Rosa", "Sam", "Sara", "Tariq", "Uma", "Victor", "Wei", "Zoe",
+)
+LAST_NAMES = (
+    "Abara", "Adams", "Ali", "Bauer", "Brown", "Chen", "Costa", "Diaz",
+    "Dubois", "Evans", "Garcia", "Gupta", "Hansen", "Ito", "Jones", "Kim",
+    "Kowalski", "Lee", "Lopez", "Mensah", "Muller", "Nakamura", "Novak",
+    "Okafor", "Patel", "Rossi", "Santos", "Schmidt", "Silva", "Smith",
+    "Tanaka", "Taylor", "Usman", "Wang", "Williams", "Wilson", "Yilmaz",
+)
+DOMAINS = ("gmail.com", "yahoo.com", "hotmail.com", "outlook.com",
+           "example.org")
+DOMAIN_WEIGHTS = (45, 20, 20, 10, 5)
+PATTERNS = ("{first}.{last}{index}", "{first}_{last}{index}",
+            "{initial}{last}{index}", "{first}{index}")
+MASK64 = 2 ** 64 - 1
+DUP_SALT = 0xD1B54A32D192ED03  # separates the duplicate stream from person()
+
+
+def _splitmix64(x):
+    """Cheap 64-bit mixer: a well-spread hash of an integer"""
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+def person(index, seed=0):
+    """(name, email) for one index; a pure function of (seed, index)"""
+    h = _splitmix64((seed << 40) ^ index)
+    h, first = divmod(h, len(FIRST_NAMES))
+    h, last = divmod(h, len(LAST_NAMES))
+    h, pattern = divmod(h, len(PATTERNS))
+    first, last = FIRST_NAMES[first], LAST_NAMES[last]
+    pick = h % sum(DOMAIN_WEIGHTS)
+    for domain, weight in zip(DOMAINS, DOMAIN_WEIGHTS):
+        if pick < weight:
+            break
+        pick -= weight
+    # the index keeps every original email unique
+    local = PATTERNS[pattern].format(
+        first=first, last=last, initial=first[0], index=index)
+    return f"{first} {last}", f"{local}@{domain}"
+
+
+def is_duplicate(index, seed=0, dup_rate=DUP_RATE):
+    """Whether row index repeats an earlier row; a pure function too.
+
+    Being decidable for any index lets a duplicate pick its source among
+    original rows only, so the emitted duplicate rate really is dup_rate.
+    """
+    if not index:
+        return False
+    h = _splitmix64(_splitmix64((seed << 40) ^ index) ^ DUP_SALT)
+    return h < dup_rate * 2 ** 64
+
+
+def age(rng):
+    """Adult ages, bell-shaped around 42 and clipped to 18..100"""
+    return min(100, max(18, int(rng.gauss(42, 16))))
+
+
+def generate_rows(rows, seed=0, dup_rate=DUP_RATE):
+    """Generator of (name, email, age) rows.
+
+    About dup_rate of the rows repeat the name and email of an earlier
+    row (with a fresh age), like re-registrations in a real export.
+    Earlier rows are recomputed from their index, not remembered.
+    """
+    rng = random.Random(seed)
+    for index in range(rows):
+        if is_duplicate(index, seed, dup_rate):
+            source = rng.randrange(index)
+            while is_duplicate(source, seed, dup_rate):
+                source = rng.randrange(index)
+            name, email = person(source, seed)
+        else:
+            name, email = person(index, seed)
+        yield name, email, age(rng)
+
+
+def generate_chunks(rows, seed=0, dup_rate=DUP_RATE, chunk_size=CHUNK_SIZE):
+    """generate_rows grouped into lists of chunk_size rows"""
+    it = generate_rows(rows, seed, dup_rate)
+    while True:
+        chunk = list(itertools.islice(it, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def tier_rows(size):
+    """Row count for a tier name or a plain integer string"""
+    return TIERS[size] if size in TIERS else int(size)
+
+
+def write_csv(path, rows, seed=0, dup_rate=DUP_RATE):
+    """Stream rows to CSV in the user_data.csv layout"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wt", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(["name", "email", "age"])
+        writer.writerows(generate_rows(rows, seed, dup_rate))
+
+
+def write_parquet(path, rows, seed=0, dup_rate=DUP_RATE,
+                  row_group_size=100_000):
+    """Stream rows to a Parquet file, one row group at a time"""
+    if pyarrow is None:
+        raise RuntimeError("write_parquet needs pyarrow installed")
+    schema = pyarrow.schema([("name", pyarrow.string()),
+                             ("email", pyarrow.string()),
+                             ("age", pyarrow.int32())])
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        for chunk in generate_chunks(rows, seed, dup_rate, row_group_size):
+            names, emails, ages = zip(*chunk)
+            writer.write_table(pyarrow.table(
+                [list(names), list(emails), list(ages)], schema=schema))
+
+
+def load(connection, rows, seed=0, dup_rate=DUP_RATE, chunk_size=CHUNK_SIZE):
+    """Stream generated rows straight into user_data"""
+    return seed_db.insert_rows_bulk(
+        connection, generate_chunks(rows, seed, dup_rate, chunk_size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("size", help=f"row count or tier: {', '.join(TIERS)}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dup-rate", type=float, default=DUP_RATE)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--out", help="write to .csv, .csv.gz or .parquet")
+    target.add_argument("--load", action="store_true",
+                        help="insert into user_data through seed")
+    args = parser.parse_args()
+
+    rows = tier_rows(args.size)
+    if args.load:
+        connection = seed_db.connect_to_prodev()
+        seed_db.create_table(connection)
+        load(connection, rows, args.seed, args.dup_rate)
+        connection.close()
+    elif args.out.endswith(".parquet"):
+        write_parquet(args.out, rows, args.seed, args.dup_rate)
+    else:
+        write_csv(args.out, rows, args.seed, args.dup_rate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/python3
+"""Shared connection pool for the generator scripts.
+
+Connections come from the backend chosen by PRODEV_BACKEND (see
+backends); MySQL credentials are read from the MYSQL_* environment
+variables and the pool size from PRODEV_POOL_SIZE.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+from backends import get_backend
+
+POOL_NAME = "prodev"
+POOL_SIZE = int(os.environ.get("PRODEV_POOL_SIZE", "5"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(size=None):
+    """Return the process-wide pool, creating it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = get_backend().create_pool(POOL_NAME, size or POOL_SIZE)
+    return _pool
+
+
+def get_connection():
+    """Check a healthy connection out of the pool.
+
+    The connection is pinged (and reconnected if the server dropped
+    it) before it is handed out. Calling close() returns it to the pool.
+    """
+    connection = get_pool().get_connection()
+    try:
+        connection.ping(reconnect=True, attempts=3, delay=0)
+    except Exception:
+        connection.close()
+        raise
+    return connection
+
+
+@contextmanager
+def connection():
+    """Context manager that borrows a pooled connection"""
+    conn = get_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
@@ -0,0 +1,181 @@
+#!/usr/bin/python3
+"""Stream user_data out to compressed NDJSON or CSV shards.
+
+Rows are read in batches by stream_users_in_batches on the main thread
+while a writer thread serializes and compresses them, with a bounded
+queue in between so memory stays at a few batches. Output is split
+into numbered shards of roughly --shard-size bytes on disk.
+
+    ./export_users.py exports/users --format ndjson --compress gzip
+    ./export_users.py exports/users --format csv --compress zstd --shard-size 64M
+"""
+import argparse
+import csv
+import decimal
+import gzip
+import io
+import json
+import queue
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+batches = __import__('1-batch_processing')
+
+BATCH_SIZE = 5000
+QUEUE_DEPTH = 4
+SHARD_SIZE = 256 * 1024 * 1024
+FORMATS = ("ndjson", "csv")
+COMPRESSIONS = ("gzip", "zstd", "none")
+SUFFIXES = {"gzip": ".gz", "zstd": ".zst", "none": ""}
+_DONE = object()
+
+
+def _json_default(value):
+    if isinstance(value, decimal.Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def serialize(rows, fmt):
+    """Encode a batch of row tuples (in COLUMNS order) to bytes"""
+    if fmt == "ndjson":
+        return "".join(
+            json.dumps(dict(zip(batches.COLUMNS, row)),
+                       default=_json_default) + "\n"
+            for row in rows
+        ).encode("utf-8")
+    buf = io.StringIO()
+    csv.writer(buf, quoting=csv.QUOTE_ALL).writerows(rows)
+    return buf.getvalue().encode("utf-8")
+
+
+def csv_header():
+    buf = io.StringIO()
+    csv.writer(buf, quoting=csv.QUOTE_ALL).writerow(batches.COLUMNS)
+    return buf.getvalue().encode("utf-8")
+
+
+class ShardWriter:
+    """Writes bytes to prefix-00000.ext, prefix-00001.ext, ..."""
+
+    def __init__(self, prefix, fmt, compress, shard_size):
+        if compress == "zstd" and zstandard is None:
+            raise RuntimeError("zstd compression needs the zstandard package")
+        self.prefix = prefix
+        self.fmt = fmt
+        self.compress = compress
+        self.shard_size = shard_size
+        self.paths = []
+        self._raw = None
+        self._out = None
+
+    def _open(self):
+        path = (f"{self.prefix}-{len(self.paths):05d}.{self.fmt}"
+                f"{SUFFIXES[self.compress]}")
+        self._raw = open(path, "wb")
+        if self.compress == "gzip":
+            self._out = gzip.GzipFile(fileobj=self._raw, mode="wb")
+        elif self.compress == "zstd":
+            self._out = zstandard.ZstdCompressor().stream_writer(self._raw)
+        else:
+            self._out = self._raw
+        self.paths.append(path)
+        if self.fmt == "csv":
+            self._out.write(csv_header())
+
+    def write(self, data):
+        if self._out is None:
+            self._open()
+        self._out.write(data)
+        # the raw file only sees compressed bytes, so this is on-disk size
+        if self._raw.tell() >= self.shard_size:
+            self.close()
+
+    def close(self):
+        if self._out is not None:
+            self._out.close()
+            if self._out is not self._raw:
+                self._raw.close()
+            self._out = self._raw = None
+
+
+def _writer(work, shards, fmt, errors):
+    """Writer thread: serialize and compress batches until _DONE"""
+    try:
+        while True:
+            rows = work.get()
+            if rows is _DONE:
+                break
+            shards.write(serialize(rows, fmt))
+    except Exception as e:
+        errors.append(e)
+        # keep draining so the reader never blocks on a full queue
+        while work.get() is not _DONE:
+            pass
+    finally:
+        # also on failure, so the current shard's file is not left open
+        try:
+            shards.close()
+        except Exception as e:
+            errors.append(e)
+
+
+def export_users(prefix, fmt="ndjson", compress="gzip",
+                 shard_size=SHARD_SIZE, batch_size=BATCH_SIZE,
+                 queue_depth=QUEUE_DEPTH):
+    """Export every user row; returns (rows written, shard paths)"""
+    if fmt not in FORMATS:
+        raise ValueError(f"fmt must be one of {FORMATS}")
+    if compress not in COMPRESSIONS:
+        raise ValueError(f"compress must be one of {COMPRESSIONS}")
+    shards = ShardWriter(prefix, fmt, compress, shard_size)
+    work = queue.Queue(queue_depth)
+    errors = []
+    writer = threading.Thread(target=_writer,
+                              args=(work, shards, fmt, errors), daemon=True)
+    writer.start()
+
+    rows = 0
+    try:
+        for batch in batches.stream_users_in_batches(batch_size, "tuple"):
+            if errors:
+                break
+            work.put(batch)
+            rows += len(batch)
+    finally:
+        work.put(_DONE)
+        writer.join()
+    if errors:
+        raise errors[0]
+    return rows, shards.paths
+
+
+def parse_size(text):
+    """'64M' -> 67108864; plain numbers are bytes"""
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    text = text.strip().upper()
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("prefix", help="shard path prefix, e.g. out/users")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--compress", choices=COMPRESSIONS, default="gzip")
+    parser.add_argument("--shard-size", type=parse_size, default=SHARD_SIZE)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    rows, paths = export_users(args.prefix, args.format, args.compress,
+                               args.shard_size, args.batch_size)
+    print(f"Exported {rows} rows to {len(paths)} file(s)")
+
+
+if __name__ == "__main__":
+    main()
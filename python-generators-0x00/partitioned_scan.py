@@ -0,0 +1,112 @@
+#!/usr/bin/python3
+"""Parallel range-partitioned scan of user_data.
+
+user_id is a UUID4 string, so its leading hex digits are uniformly
+distributed. The key space is cut into contiguous prefix ranges and
+each range is read on its own worker thread with its own pooled
+connection. Batches come back through bounded queues, so a slow
+consumer throttles the readers instead of buffering the table.
+"""
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+db_pool = __import__('db_pool')
+
+BATCH_SIZE = 1000
+QUEUE_DEPTH = 4
+_DONE = object()
+
+
+def key_ranges(partitions):
+    """Split the user_id space into (low, high) bounds, None = open end"""
+    if not 1 <= partitions <= 256:
+        raise ValueError("partitions must be between 1 and 256")
+    bounds = [f"{256 * i // partitions:02x}" for i in range(1, partitions)]
+    lows = [None] + bounds
+    highs = bounds + [None]
+    return list(zip(lows, highs))
+
+
+def _range_query(low, high, ordered):
+    clauses, params = [], []
+    if low is not None:
+        clauses.append("user_id >= %s")
+        params.append(low)
+    if high is not None:
+        clauses.append("user_id < %s")
+        params.append(high)
+    query = "SELECT user_id, name, email, age FROM user_data"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    if ordered:
+        query += " ORDER BY user_id"
+    return query, tuple(params)
+
+
+def _put(out, item, stop):
+    """Blocking put that gives up once the consumer has gone away"""
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _scan_range(low, high, ordered, batch_size, out, stop):
+    """Worker: stream one key range into `out`, then post _DONE"""
+    try:
+        with db_pool.connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(*_range_query(low, high, ordered))
+            while not stop.is_set():
+                rows = cursor.fetchmany(batch_size)
+                if not rows or not _put(out, rows, stop):
+                    break
+            cursor.close()
+    except Exception as e:
+        _put(out, e, stop)
+    _put(out, _DONE, stop)
+
+
+def partitioned_scan(partitions=4, ordered=False, batch_size=BATCH_SIZE,
+                     queue_depth=QUEUE_DEPTH):
+    """Generator over every user_data row, read by `partitions` workers.
+
+    ordered=True yields rows in user_id order: partitions are read
+    concurrently but drained one after another. ordered=False yields
+    batches as soon as any worker has one. The pool must allow at
+    least `partitions` connections (PRODEV_POOL_SIZE).
+    """
+    ranges = key_ranges(partitions)
+    stop = threading.Event()
+    if ordered:
+        queues = [queue.Queue(queue_depth) for _ in ranges]
+    else:
+        queues = [queue.Queue(queue_depth * len(ranges))] * len(ranges)
+
+    with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+        try:
+            for (low, high), out in zip(ranges, queues):
+                executor.submit(_scan_range, low, high, ordered,
+                                batch_size, out, stop)
+            if ordered:
+                for out in queues:
+                    yield from _drain(out, 1)
+            else:
+                yield from _drain(queues[0], len(ranges))
+        finally:
+            stop.set()
+
+
+def _drain(out, workers):
+    """Yield rows from `out` until `workers` _DONE markers have arrived"""
+    while workers:
+        item = out.get()
+        if item is _DONE:
+            workers -= 1
+        elif isinstance(item, Exception):
+            raise item
+        else:
+            yield from item
@@ -0,0 +1,250 @@
+#!/usr/bin/python3
+"""Composable generator pipelines for user streams.
+
+Stages are chained lazily and pulled by the consumer, so a stage never
+runs further ahead than the next one asks for. Where work is moved off
+the consumer's thread (buffer, parallel_map, tee) it goes through a
+bounded queue or a bounded set of in-flight tasks, so a slow stage
+slows its producers down instead of piling up rows.
+
+    stream_users = __import__('0-stream_users').stream_users
+    pipe = (Pipeline(stream_users(stream=True))
+            .filter(lambda u: u["age"] > 25)
+            .buffer(1000)
+            .parallel_map(score, workers=4, processes=True)
+            .batch(500))
+    for batch in pipe:
+        ...
+    print(pipe.stats())
+"""
+import collections
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+
+_DONE = object()
+
+
+class StageStats:
+    """Items emitted by one stage and how fast"""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.first = None
+        self.last = None
+
+    def record(self):
+        now = time.perf_counter()
+        if self.first is None:
+            self.first = now
+        self.last = now
+        self.items += 1
+
+    @property
+    def rate(self):
+        """Items per second between the first and last item"""
+        if self.first is None or self.last == self.first:
+            return 0.0
+        return self.items / (self.last - self.first)
+
+    def as_dict(self):
+        return {"stage": self.name, "items": self.items,
+                "rate": round(self.rate, 1)}
+
+
+class _Error:
+    """Carries an exception from a worker thread to the consumer"""
+
+    def __init__(self, exc):
+        self.exc = exc
+
+
+def _pump(source, outputs):
+    """Thread body: copy source into every live output, then _DONE.
+
+    outputs are (queue, stop event) pairs, one per consumer. A consumer
+    that goes away sets its event and is skipped from then on, while
+    the others still get every item and their _DONE; once all of them
+    are gone the pump closes source and returns.
+    """
+    def put(out, stop, item):
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    try:
+        for item in source:
+            live = [(out, stop) for out, stop in outputs if not stop.is_set()]
+            if not live:
+                return
+            for out, stop in live:
+                put(out, stop, item)
+    except Exception as e:
+        for out, stop in outputs:
+            put(out, stop, _Error(e))
+    finally:
+        close = getattr(source, "close", None)
+        if close is not None:
+            close()
+    for out, stop in outputs:
+        put(out, stop, _DONE)
+
+
+def _drain(out, stop):
+    try:
+        while True:
+            item = out.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Error):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+
+
+class _Branch:
+    """One tee output. The draining generator is made on iteration and
+    not kept, so dropping the consumer's iterator closes it and frees
+    the pump from feeding this branch."""
+
+    def __init__(self, out, stop):
+        self._out = out
+        self._stop = stop
+
+    def __iter__(self):
+        return _drain(self._out, self._stop)
+
+
+class Pipeline:
+    """A source iterable plus a chain of lazy stages"""
+
+    def __init__(self, source, name="source"):
+        self._source = source
+        self._stages = [(name, lambda it: it)]
+        self._stats = []
+
+    def _add(self, name, transform):
+        self._stages.append((name, transform))
+        return self
+
+    def __iter__(self):
+        it = iter(self._source)
+        self._stats = []
+        for name, transform in self._stages:
+            stats = StageStats(name)
+            self._stats.append(stats)
+            it = self._counted(transform(it), stats)
+        return it
+
+    @staticmethod
+    def _counted(it, stats):
+        for item in it:
+            stats.record()
+            yield item
+
+    def stats(self):
+        """Per-stage item counts and throughput of the last run"""
+        return [s.as_dict() for s in self._stats]
+
+    def map(self, func, name="map"):
+        return self._add(name, lambda it: map(func, it))
+
+    def filter(self, predicate, name="filter"):
+        return self._add(name, lambda it: filter(predicate, it))
+
+    def batch(self, size, name="batch"):
+        """Group items into lists of at most size"""
+        def stage(it):
+            while True:
+                chunk = list(itertools.islice(it, size))
+                if not chunk:
+                    return
+                yield chunk
+        return self._add(name, stage)
+
+    def flatten(self, name="flatten"):
+        """Undo batch: yield the items of each incoming iterable"""
+        return self._add(name, itertools.chain.from_iterable)
+
+    def window(self, size, step=1, name="window"):
+        """Sliding tuples of size items, advancing by step (step=size
+        gives tumbling windows); a trailing partial window is dropped"""
+        def stage(it):
+            win = collections.deque(maxlen=size)
+            skip = 0
+            for item in it:
+                win.append(item)
+                if skip:
+                    skip -= 1
+                    continue
+                if len(win) == size:
+                    yield tuple(win)
+                    skip = step - 1
+        return self._add(name, stage)
+
+    def buffer(self, size, name="buffer"):
+        """Run everything upstream on a thread, at most size items ahead"""
+        def stage(it):
+            out = queue.Queue(size)
+            stop = threading.Event()
+            threading.Thread(target=_pump, args=(it, [(out, stop)]),
+                             daemon=True).start()
+            return _drain(out, stop)
+        return self._add(name, stage)
+
+    def parallel_map(self, func, workers=4, processes=False, ordered=True,
+                     max_pending=None, name="parallel_map"):
+        """map() on a thread pool, or a process pool for CPU-heavy func
+        (which must then be picklable). At most max_pending calls
+        (default 2 * workers) are in flight at once."""
+        max_pending = max_pending or 2 * workers
+        executor_class = ProcessPoolExecutor if processes \
+            else ThreadPoolExecutor
+
+        def stage(it):
+            with executor_class(max_workers=workers) as executor:
+                pending = collections.deque()
+                try:
+                    for item in it:
+                        pending.append(executor.submit(func, item))
+                        if len(pending) >= max_pending:
+                            yield from self._ready(pending, ordered, 1)
+                    yield from self._ready(pending, ordered, len(pending))
+                finally:
+                    for future in pending:
+                        future.cancel()
+        return self._add(name, stage)
+
+    @staticmethod
+    def _ready(pending, ordered, count):
+        """Pop and yield `count` results: oldest first, or any finished"""
+        for _ in range(count):
+            if ordered:
+                yield pending.popleft().result()
+                continue
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            done = next(iter(done))
+            pending.remove(done)
+            yield done.result()
+
+    def tee(self, n=2, size=1000):
+        """Split into n Pipelines fed by one pump thread.
+
+        Each branch buffers at most size items, and the pump waits for
+        the slowest branch, so the branches must be consumed
+        concurrently (e.g. one thread each). A branch abandoned early
+        stops receiving items without holding up the others.
+        """
+        outputs = [(queue.Queue(size), threading.Event()) for _ in range(n)]
+        threading.Thread(target=_pump, args=(iter(self), outputs),
+                         daemon=True).start()
+        return [Pipeline(_Branch(out, stop), name=f"tee[{i}]")
+                for i, (out, stop) in enumerate(outputs)]
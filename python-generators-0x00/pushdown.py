@@ -0,0 +1,146 @@
+#!/usr/bin/python3
+"""Small query-pushdown layer over user_data.
+
+Filters and aggregates are compiled to SQL and run on the server, so
+only the answer crosses the wire. When a Query is given a `source`
+(any iterable of row dicts, e.g. stream_users()) the same operations
+are evaluated by streaming over it instead.
+
+    Query().where("age", ">", 25).avg("age")
+"""
+import operator
+db_pool = __import__('db_pool')
+
+TABLE = "user_data"
+COLUMNS = ("user_id", "name", "email", "age")
+OPERATORS = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+def _check_column(column):
+    """Only known column names may be spliced into SQL"""
+    if column not in COLUMNS:
+        raise ValueError(f"Unknown column: {column}")
+    return column
+
+
+class Query:
+    """Immutable filter over user_data with SQL or streaming evaluation"""
+
+    def __init__(self, source=None, predicates=()):
+        self.source = source
+        self.predicates = tuple(predicates)
+
+    def where(self, column, op, value):
+        """Return a new Query with one more `column op value` predicate"""
+        if op not in OPERATORS:
+            raise ValueError(f"Unsupported operator: {op}")
+        predicate = (_check_column(column), op, value)
+        return Query(self.source, self.predicates + (predicate,))
+
+    @property
+    def pushdown(self):
+        """True when this query runs as SQL on the server"""
+        return self.source is None
+
+    def _where_sql(self):
+        if not self.predicates:
+            return "", ()
+        clause = " AND ".join(f"{col} {op} %s" for col, op, _ in self.predicates)
+        return " WHERE " + clause, tuple(v for _, _, v in self.predicates)
+
+    def _fetchall(self, select, tail=""):
+        where, params = self._where_sql()
+        with db_pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"SELECT {select} FROM {TABLE}{where}{tail}", params)
+            rows = cursor.fetchall()
+            cursor.close()
+        return rows
+
+    def _matches(self, row):
+        return all(OPERATORS[op](row[col], value)
+                   for col, op, value in self.predicates)
+
+    def _stream(self):
+        return (row for row in self.source if self._matches(row))
+
+    def batches(self, batch_size):
+        """Yield lists of matching rows (dicts), batch_size at a time"""
+        if not self.pushdown:
+            batch = []
+            for row in self._stream():
+                batch.append(row)
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+            return
+
+        where, params = self._where_sql()
+        with db_pool.connection() as connection:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM {TABLE}{where}", params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+            cursor.close()
+
+    def count(self):
+        """Number of matching rows"""
+        if not self.pushdown:
+            return sum(1 for _ in self._stream())
+        return self._fetchall("COUNT(*)")[0][0]
+
+    def avg(self, column):
+        """Mean of column over matching rows, or None if there are none"""
+        _check_column(column)
+        if not self.pushdown:
+            total = count = 0
+            for row in self._stream():
+                total += row[column]
+                count += 1
+            return float(total) / count if count else None
+        value = self._fetchall(f"AVG({column})")[0][0]
+        return float(value) if value is not None else None
+
+    def min(self, column):
+        """Smallest value of column over matching rows"""
+        _check_column(column)
+        if not self.pushdown:
+            return min((row[column] for row in self._stream()), default=None)
+        return self._fetchall(f"MIN({column})")[0][0]
+
+    def max(self, column):
+        """Largest value of column over matching rows"""
+        _check_column(column)
+        if not self.pushdown:
+            return max((row[column] for row in self._stream()), default=None)
+        return self._fetchall(f"MAX({column})")[0][0]
+
+    def age_buckets(self, width=10):
+        """Row counts grouped by age bucket: {bucket start: count}"""
+        width = int(width)
+        if width <= 0:
+            raise ValueError("width must be positive")
+        if not self.pushdown:
+            buckets = {}
+            for row in self._stream():
+                bucket = int(row["age"] // width) * width
+                buckets[bucket] = buckets.get(bucket, 0) + 1
+            return dict(sorted(buckets.items()))
+        rows = self._fetchall(
+            f"FLOOR(age / {width}) * {width} AS bucket, COUNT(*)",
+            " GROUP BY bucket ORDER BY bucket"
+        )
+        return {int(bucket): count for bucket, count in rows}
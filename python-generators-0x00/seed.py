@@ -1,20 +1,20 @@
 #!/usr/bin/python3
-import mysql.connector
-from mysql.connector import Error
 import csv
+import hashlib
+import sqlite3
+import time
 import uuid
 
-DB_NAME = "ALX_prodev"
+from backends import DB_NAME, Error, get_backend
+
+CHUNK_SIZE = 5000
+MANIFEST_PATH = f"{DB_NAME}.manifest.sqlite3"
 
 
 def connect_db():
     """Connect to MySQL server (without selecting a database)."""
     try:
-        connection = mysql.connector.connect(
-            host="localhost",
-            user="Benose13",          
-            password="Iamhead-11"   
-        )
+        connection = get_backend().connect(database=False)
         if connection.is_connected():
             return connection
     except Error as e:
@@ -25,9 +25,7 @@ def connect_db():
 def create_database(connection):
     """Create database ALX_prodev if it does not exist."""
     try:
-        cursor = connection.cursor()
-        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_NAME}")
-        cursor.close()
+        get_backend().create_database(connection)
     except Error as e:
         print(f"Error creating database: {e}")
 
@@ -35,12 +33,7 @@ def create_database(connection):
 def connect_to_prodev():
     """Connect directly to ALX_prodev database."""
     try:
-        connection = mysql.connector.connect(
-            host="localhost",
-            user="Benose13",          
-            password="Iamhead-11",  
-            database=DB_NAME
-        )
+        connection = get_backend().connect(database=True)
         if connection.is_connected():
             return connection
     except Error as e:
@@ -51,18 +44,8 @@ def connect_to_prodev():
 def create_table(connection):
     """Create user_data table if not exists."""
     try:
-        cursor = connection.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_data (
-                user_id CHAR(36) PRIMARY KEY,
-                name VARCHAR(255) NOT NULL,
-                email VARCHAR(255) NOT NULL,
-                age DECIMAL NOT NULL,
-                INDEX(user_id)
-            )
-        """)
+        get_backend().create_table(connection)
         connection.commit()
-        cursor.close()
         print("Table user_data created successfully")
     except Error as e:
         print(f"Error creating table: {e}")
@@ -93,3 +76,170 @@ def insert_data(connection, csv_file):
         cursor.close()
     except Error as e:
         print(f"Error inserting data: {e}")
+
+
+def ensure_email_index(connection):
+    """Add the unique email index to tables created before it existed."""
+    if not get_backend().has_index(connection, "user_data", "uniq_email"):
+        cursor = connection.cursor()
+        cursor.execute(
+            "CREATE UNIQUE INDEX uniq_email ON user_data (email)")
+        connection.commit()
+        cursor.close()
+
+
+def ensure_seq_column(connection):
+    """Add the insertion-order seq column to tables created before it."""
+    # SQLite tables are always created with seq (see backends)
+    if not get_backend().has_column(connection, "user_data", "seq"):
+        cursor = connection.cursor()
+        cursor.execute(
+            "ALTER TABLE user_data "
+            "ADD COLUMN seq BIGINT NOT NULL AUTO_INCREMENT UNIQUE")
+        connection.commit()
+        cursor.close()
+
+
+def read_csv_chunks(csv_file, chunk_size=CHUNK_SIZE):
+    """Yield lists of (name, email, age) rows, deduplicated per chunk."""
+    with open(csv_file, "r", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        chunk = {}
+        for row in reader:
+            # first occurrence wins, same as the row-by-row loader
+            chunk.setdefault(row["email"], (row["name"], row["email"], row["age"]))
+            if len(chunk) >= chunk_size:
+                yield list(chunk.values())
+                chunk = {}
+        if chunk:
+            yield list(chunk.values())
+
+
+def insert_data_bulk(connection, csv_file, chunk_size=CHUNK_SIZE):
+    """Bulk-load a CSV file into user_data, one executemany per chunk.
+
+    Duplicate emails are dropped by the unique index (INSERT IGNORE),
+    so no per-row lookup is needed. Each chunk is committed on its own
+    and progress is printed as rows/second. Returns the rows inserted.
+    """
+    return insert_rows_bulk(connection, read_csv_chunks(csv_file, chunk_size))
+
+
+def insert_rows_bulk(connection, chunks):
+    """Bulk-load an iterable of [(name, email, age), ...] chunks.
+
+    Same semantics as insert_data_bulk, for rows that do not come
+    from a CSV file (e.g. datagen.generate_chunks).
+    """
+    inserted = 0
+    try:
+        ensure_email_index(connection)
+        cursor = connection.cursor()
+        start = time.perf_counter()
+        read = 0
+        for chunk in chunks:
+            cursor.executemany(
+                f"{get_backend().insert_ignore} INTO user_data (user_id, name, email, age) "
+                "VALUES (%s, %s, %s, %s)",
+                [(str(uuid.uuid4()), name, email, age)
+                 for name, email, age in chunk]
+            )
+            inserted += cursor.rowcount
+            connection.commit()
+            read += len(chunk)
+            elapsed = time.perf_counter() - start
+            rate = read / elapsed if elapsed else 0
+            print(f"[seed] {read} rows read, {inserted} inserted "
+                  f"({rate:.0f} rows/s)")
+        cursor.close()
+    except Error as e:
+        connection.rollback()
+        print(f"Error inserting data: {e}")
+    return inserted
+
+
+def fingerprint(name, age):
+    """Short digest of the non-key columns of one CSV row."""
+    return hashlib.blake2b(f"{name}\x1f{age}".encode("utf-8"),
+                           digest_size=8).digest()
+
+
+def _stage_csv(manifest, csv_file):
+    """Load the CSV into a temp table; the first row per email wins."""
+    manifest.execute("""
+        CREATE TEMP TABLE incoming (
+            email TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            age TEXT NOT NULL,
+            digest BLOB NOT NULL
+        )
+    """)
+    with open(csv_file, "r", encoding="utf-8") as f:
+        manifest.executemany(
+            "INSERT OR IGNORE INTO incoming VALUES (?, ?, ?, ?)",
+            ((row["email"], row["name"], row["age"],
+              fingerprint(row["name"], row["age"]))
+             for row in csv.DictReader(f))
+        )
+    # only rows the manifest has never seen, or has seen with other values
+    manifest.execute("""
+        CREATE TEMP TABLE pending AS
+        SELECT i.name, i.email, i.age, i.digest, m.email IS NULL AS is_new
+        FROM incoming i LEFT JOIN manifest m ON m.email = i.email
+        WHERE m.digest IS NULL OR m.digest != i.digest
+    """)
+
+
+def sync_data(connection, csv_file, manifest_path=MANIFEST_PATH,
+              chunk_size=CHUNK_SIZE):
+    """Incrementally sync user_data with a (re-)exported CSV file.
+
+    A local SQLite manifest keeps a fingerprint per email of what has
+    already been loaded. Only new and changed rows are upserted, in
+    executemany chunks, and the manifest is updated after each chunk
+    is committed, so an interrupted sync just redoes its last chunk.
+    Returns (new rows, changed rows).
+    """
+    new = changed = 0
+    manifest = sqlite3.connect(manifest_path)
+    try:
+        manifest.execute("""
+            CREATE TABLE IF NOT EXISTS manifest (
+                email TEXT PRIMARY KEY,
+                digest BLOB NOT NULL
+            )
+        """)
+        start = time.perf_counter()
+        _stage_csv(manifest, csv_file)
+        ensure_email_index(connection)
+        cursor = connection.cursor()
+        pending = manifest.execute(
+            "SELECT name, email, age, digest, is_new FROM pending")
+        while True:
+            chunk = pending.fetchmany(chunk_size)
+            if not chunk:
+                break
+            cursor.executemany(
+                get_backend().upsert_users,
+                [(str(uuid.uuid4()), name, email, age)
+                 for name, email, age, _, _ in chunk]
+            )
+            connection.commit()
+            with manifest:
+                manifest.executemany(
+                    "INSERT OR REPLACE INTO manifest (email, digest) "
+                    "VALUES (?, ?)",
+                    [(email, digest) for _, email, _, digest, _ in chunk]
+                )
+            fresh = sum(is_new for *_, is_new in chunk)
+            new += fresh
+            changed += len(chunk) - fresh
+        cursor.close()
+        elapsed = time.perf_counter() - start
+        print(f"[seed] sync: {new} new, {changed} changed in {elapsed:.1f}s")
+    except Error as e:
+        connection.rollback()
+        print(f"Error syncing data: {e}")
+    finally:
+        manifest.close()
+    return new, changed
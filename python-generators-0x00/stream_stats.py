@@ -0,0 +1,231 @@
+#!/usr/bin/python3
+"""One-pass, constant-memory statistics over user ages.
+
+StreamingStats keeps count, mean and variance (Welford), min/max,
+a fixed-width histogram and P-square quantile estimates. Its state
+can be saved to JSON together with the highest user_data.seq it has
+seen, so a later refresh only reads rows inserted since then.
+
+    stats = refresh("age_stats.json")
+    print(stats.summary())
+"""
+import json
+import math
+import os
+db_pool = __import__('db_pool')
+seed = __import__('seed')
+
+QUANTILES = (0.5, 0.9, 0.99)
+BUCKET_WIDTH = 10
+FETCH_SIZE = 5000
+
+
+class P2Quantile:
+    """Jain & Chlamtac P-square estimator: one quantile in five markers"""
+
+    def __init__(self, p):
+        self.p = p
+        self.heights = []
+        self.positions = [0, 1, 2, 3, 4]
+        self.desired = [0, 2 * p, 4 * p, 2 + 2 * p, 4]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x):
+        q = self.heights
+        if len(q) < 5:
+            q.append(x)
+            q.sort()
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(4) if x < q[i + 1])
+
+        n = self.positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or \
+                    (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                candidate = self._parabolic(i, d)
+                if not q[i - 1] < candidate < q[i + 1]:
+                    candidate = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = candidate
+                n[i] += d
+
+    def _parabolic(self, i, d):
+        q, n = self.heights, self.positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self):
+        q = self.heights
+        if not q:
+            return None
+        if len(q) < 5:
+            return q[min(len(q) - 1, int(self.p * len(q)))]
+        return q[2]
+
+    def to_dict(self):
+        return {"p": self.p, "heights": self.heights,
+                "positions": self.positions, "desired": self.desired}
+
+    @classmethod
+    def from_dict(cls, state):
+        estimator = cls(state["p"])
+        estimator.heights = state["heights"]
+        estimator.positions = state["positions"]
+        estimator.desired = state["desired"]
+        return estimator
+
+
+class StreamingStats:
+    """Running mean/variance/min/max/histogram/quantiles of a stream"""
+
+    def __init__(self, quantiles=QUANTILES, bucket_width=BUCKET_WIDTH):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.bucket_width = bucket_width
+        self.histogram = {}
+        self.quantiles = [P2Quantile(p) for p in quantiles]
+        self.last_seq = 0
+
+    def add(self, x):
+        """Fold one value into the statistics"""
+        x = float(x)
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.min = x if self.min is None else min(self.min, x)
+        self.max = x if self.max is None else max(self.max, x)
+        bucket = int(x // self.bucket_width) * self.bucket_width
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+        for estimator in self.quantiles:
+            estimator.add(x)
+
+    def update(self, values):
+        """Fold an iterable of values into the statistics"""
+        for x in values:
+            self.add(x)
+        return self
+
+    @property
+    def variance(self):
+        """Sample variance, or None below two values"""
+        return self.m2 / (self.count - 1) if self.count > 1 else None
+
+    @property
+    def stddev(self):
+        variance = self.variance
+        return math.sqrt(variance) if variance is not None else None
+
+    def quantile(self, p):
+        """Estimate for one of the tracked quantiles"""
+        for estimator in self.quantiles:
+            if estimator.p == p:
+                return estimator.value()
+        raise KeyError(f"quantile {p} is not tracked")
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.mean if self.count else None,
+            "variance": self.variance,
+            "stddev": self.stddev,
+            "min": self.min,
+            "max": self.max,
+            "quantiles": {e.p: e.value() for e in self.quantiles},
+            "histogram": dict(sorted(self.histogram.items())),
+        }
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "m2": self.m2,
+            "min": self.min,
+            "max": self.max,
+            "bucket_width": self.bucket_width,
+            # JSON object keys are strings
+            "histogram": {str(k): v for k, v in self.histogram.items()},
+            "quantiles": [e.to_dict() for e in self.quantiles],
+            "last_seq": self.last_seq,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        stats = cls(quantiles=(), bucket_width=state["bucket_width"])
+        stats.count = state["count"]
+        stats.mean = state["mean"]
+        stats.m2 = state["m2"]
+        stats.min = state["min"]
+        stats.max = state["max"]
+        stats.histogram = {int(k): v for k, v in state["histogram"].items()}
+        stats.quantiles = [P2Quantile.from_dict(q) for q in state["quantiles"]]
+        stats.last_seq = state["last_seq"]
+        return stats
+
+    def save(self, path):
+        """Write the state atomically to a JSON checkpoint"""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def stream_ages_since(last_seq, fetch_size=FETCH_SIZE):
+    """Generator of (seq, age) for rows inserted after last_seq.
+
+    Tables created before seq existed get the column added first.
+    """
+    with db_pool.connection() as connection:
+        seed.ensure_seq_column(connection)
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT seq, age FROM user_data WHERE seq > %s ORDER BY seq",
+            (last_seq,)
+        )
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            yield from rows
+        cursor.close()
+
+
+def update_from_db(stats):
+    """Fold rows inserted since stats.last_seq into stats"""
+    for seq, age in stream_ages_since(stats.last_seq):
+        stats.add(age)
+        stats.last_seq = seq
+    return stats
+
+
+def refresh(path):
+    """Load the checkpoint at path (if any), catch up, save it back"""
+    stats = StreamingStats.load(path) if os.path.exists(path) \
+        else StreamingStats()
+    update_from_db(stats)
+    stats.save(path)
+    return stats
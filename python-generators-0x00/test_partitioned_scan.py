@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+"""Tests for partitioned_scan.py against the SQLite backend."""
+import os
+import sqlite3
+import tempfile
+import unittest
+import uuid
+from unittest import mock
+
+import backends
+import db_pool
+import partitioned_scan
+
+ROWS = 3000
+
+
+def setUpModule():
+    global tmpdir, environ
+    tmpdir = tempfile.TemporaryDirectory()
+    path = os.path.join(tmpdir.name, "prodev.sqlite3")
+    # restored by tearDownModule, so later test modules see the old values
+    environ = mock.patch.dict(os.environ, {"PRODEV_BACKEND": "sqlite",
+                                           "PRODEV_SQLITE_PATH": path})
+    environ.start()
+    backends._backend = None
+    db_pool._pool = None
+    backend = backends.get_backend()
+    connection = backend.connect()
+    backend.create_table(connection)
+    connection.cursor().executemany(
+        "INSERT INTO user_data (user_id, name, email, age) "
+        "VALUES (%s, %s, %s, %s)",
+        [(str(uuid.uuid4()), f"user{i}", f"u{i}@example.org", 18 + i % 80)
+         for i in range(ROWS)])
+    connection.commit()
+    connection.close()
+    db_pool.get_pool(size=8)
+
+
+def tearDownModule():
+    backends._backend = None
+    db_pool._pool = None
+    environ.stop()
+    tmpdir.cleanup()
+
+
+def all_user_ids():
+    connection = sqlite3.connect(os.environ["PRODEV_SQLITE_PATH"])
+    ids = sorted(r[0] for r in connection.execute(
+        "SELECT user_id FROM user_data"))
+    connection.close()
+    return ids
+
+
+class KeyRangesTest(unittest.TestCase):
+
+    def test_ranges_are_contiguous_and_open_ended(self):
+        ranges = partitioned_scan.key_ranges(4)
+        self.assertEqual(ranges, [(None, "40"), ("40", "80"),
+                                  ("80", "c0"), ("c0", None)])
+        self.assertEqual(partitioned_scan.key_ranges(1), [(None, None)])
+
+    def test_partition_count_is_checked(self):
+        for bad in (0, 257):
+            with self.assertRaises(ValueError):
+                partitioned_scan.key_ranges(bad)
+
+
+class PartitionedScanTest(unittest.TestCase):
+
+    def test_unordered_scan_returns_every_row_once(self):
+        rows = list(partitioned_scan.partitioned_scan(4, batch_size=100))
+        self.assertEqual(sorted(r["user_id"] for r in rows), all_user_ids())
+        self.assertEqual(set(rows[0]), {"user_id", "name", "email", "age"})
+
+    def test_ordered_scan_is_sorted_by_user_id(self):
+        rows = partitioned_scan.partitioned_scan(
+            8, ordered=True, batch_size=64, queue_depth=1)
+        self.assertEqual([r["user_id"] for r in rows], all_user_ids())
+
+    def test_abandoned_scan_releases_its_workers(self):
+        for _ in range(3):
+            scan = partitioned_scan.partitioned_scan(
+                8, batch_size=10, queue_depth=1)
+            self.assertEqual(len([next(scan) for _ in range(5)]), 5)
+            # closing joins the workers, which hand their connections
+            # back, so the next scan can get all 8 again
+            scan.close()
+        self.assertEqual(
+            len(list(partitioned_scan.partitioned_scan(8))), ROWS)
+
+
+if __name__ == "__main__":
+    unittest.main()
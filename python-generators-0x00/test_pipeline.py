@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+"""Tests for pipeline.py; run with `python -m unittest` or pytest."""
+import threading
+import time
+import unittest
+
+from pipeline import Pipeline
+
+
+def consume(pipe, into, stop_after=None):
+    for i, item in enumerate(pipe):
+        if stop_after is not None and i >= stop_after:
+            break
+        into.append(item)
+
+
+class PipelineTest(unittest.TestCase):
+
+    def test_stages_compose_lazily(self):
+        pipe = (Pipeline(range(20))
+                .filter(lambda x: x % 2 == 0)
+                .map(lambda x: x * 10)
+                .batch(3))
+        self.assertEqual(list(pipe), [[0, 20, 40], [60, 80, 100],
+                                      [120, 140, 160], [180]])
+        self.assertEqual([s["items"] for s in pipe.stats()],
+                         [20, 10, 10, 4])
+
+    def test_window_and_flatten(self):
+        self.assertEqual(list(Pipeline(range(5)).window(3)),
+                         [(0, 1, 2), (1, 2, 3), (2, 3, 4)])
+        self.assertEqual(list(Pipeline(range(6)).window(2, step=2)),
+                         [(0, 1), (2, 3), (4, 5)])
+        self.assertEqual(list(Pipeline(range(7)).batch(3).flatten()),
+                         list(range(7)))
+
+    def test_buffer_propagates_errors(self):
+        def source():
+            yield 1
+            raise RuntimeError("source failed")
+        with self.assertRaises(RuntimeError):
+            list(Pipeline(source()).buffer(2))
+
+    def test_parallel_map_ordered(self):
+        def slow_first(x):
+            time.sleep(0.1 if x == 0 else 0)
+            return x
+        pipe = Pipeline(range(8)).parallel_map(slow_first, workers=4)
+        self.assertEqual(list(pipe), list(range(8)))
+
+    def test_parallel_map_unordered_yields_first_finished(self):
+        def slow_first(x):
+            time.sleep(0.3 if x == 0 else 0.01)
+            return x
+        pipe = Pipeline(range(4)).parallel_map(
+            slow_first, workers=4, ordered=False, max_pending=4)
+        results = list(pipe)
+        self.assertEqual(sorted(results), [0, 1, 2, 3])
+        self.assertEqual(results[-1], 0)
+
+    def test_tee_delivers_everything_to_every_branch(self):
+        left, right = Pipeline(range(1000)).tee(2, size=10)
+        a, b = [], []
+        threads = [threading.Thread(target=consume, args=(left, a)),
+                   threading.Thread(target=consume, args=(right, b))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(10)
+        self.assertEqual(a, list(range(1000)))
+        self.assertEqual(b, list(range(1000)))
+
+    def test_tee_branch_stopping_early_does_not_hang_the_other(self):
+        left, right = Pipeline(range(100000)).tee(2, size=10)
+        a, b = [], []
+        threads = [
+            threading.Thread(target=consume, args=(left, a, 5), daemon=True),
+            threading.Thread(target=consume, args=(right, b), daemon=True),
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(10)
+        self.assertFalse(any(t.is_alive() for t in threads))
+        self.assertEqual(a, list(range(5)))
+        self.assertEqual(len(b), 100000)
+
+    def test_tee_propagates_errors_to_every_branch(self):
+        branches = Pipeline(iter([1, 2, 3])).map(lambda x: 1 / (x - 2)).tee(2)
+        for branch in branches:
+            with self.assertRaises(ZeroDivisionError):
+                list(branch)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+#!/usr/bin/python3
+"""Tests for stream_stats.py; refresh() runs on the SQLite backend."""
+import os
+import random
+import statistics
+import tempfile
+import unittest
+import uuid
+from unittest import mock
+
+import backends
+import db_pool
+import stream_stats
+
+
+def setUpModule():
+    global tmpdir, environ
+    tmpdir = tempfile.TemporaryDirectory()
+    environ = mock.patch.dict(os.environ, {
+        "PRODEV_BACKEND": "sqlite",
+        "PRODEV_SQLITE_PATH": os.path.join(tmpdir.name, "prodev.sqlite3"),
+    })
+    environ.start()
+    backends._backend = None
+    db_pool._pool = None
+    backend = backends.get_backend()
+    connection = backend.connect()
+    backend.create_table(connection)
+    connection.close()
+
+
+def tearDownModule():
+    backends._backend = None
+    db_pool._pool = None
+    environ.stop()
+    tmpdir.cleanup()
+
+
+def insert_ages(ages):
+    connection = backends.get_backend().connect()
+    connection.cursor().executemany(
+        "INSERT INTO user_data (user_id, name, email, age) "
+        "VALUES (%s, %s, %s, %s)",
+        [(str(uuid.uuid4()), "user", f"{uuid.uuid4()}@example.org", age)
+         for age in ages])
+    connection.commit()
+    connection.close()
+
+
+class P2QuantileTest(unittest.TestCase):
+
+    def test_estimates_track_exact_quantiles(self):
+        rng = random.Random(1)
+        for values in ([rng.gauss(50, 15) for _ in range(20000)],
+                       [rng.expovariate(0.1) for _ in range(20000)]):
+            exact = statistics.quantiles(values, n=100)
+            spread = exact[98] - exact[0]
+            for p, cut in ((0.5, exact[49]), (0.9, exact[89]),
+                           (0.99, exact[98])):
+                estimator = stream_stats.P2Quantile(p)
+                for x in values:
+                    estimator.add(x)
+                self.assertAlmostEqual(estimator.value(), cut,
+                                       delta=0.02 * spread)
+
+    def test_fewer_than_five_values_are_exact(self):
+        estimator = stream_stats.P2Quantile(0.5)
+        for x in (3, 1, 2):
+            estimator.add(x)
+        self.assertEqual(estimator.value(), 2)
+        self.assertIsNone(stream_stats.P2Quantile(0.9).value())
+
+
+class StreamingStatsTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(2)
+        self.values = [rng.randint(18, 90) for _ in range(5000)]
+
+    def test_one_pass_matches_statistics(self):
+        stats = stream_stats.StreamingStats().update(self.values)
+        self.assertEqual(stats.count, len(self.values))
+        self.assertAlmostEqual(stats.mean, statistics.mean(self.values))
+        self.assertAlmostEqual(stats.variance,
+                               statistics.variance(self.values))
+        self.assertEqual((stats.min, stats.max),
+                         (min(self.values), max(self.values)))
+        self.assertEqual(sum(stats.histogram.values()), len(self.values))
+        self.assertEqual(stats.histogram[20],
+                         sum(20 <= v < 30 for v in self.values))
+
+    def test_checkpoint_round_trip_then_catch_up(self):
+        # folding the second half into a saved and reloaded first half
+        # gives the same state as one pass over everything
+        half = len(self.values) // 2
+        first = stream_stats.StreamingStats().update(self.values[:half])
+        first.last_seq = 42
+        path = os.path.join(tmpdir.name, "checkpoint.json")
+        first.save(path)
+        resumed = stream_stats.StreamingStats.load(path)
+        self.assertEqual(resumed.to_dict(), first.to_dict())
+        resumed.update(self.values[half:])
+        whole = stream_stats.StreamingStats().update(self.values)
+        self.assertEqual(resumed.last_seq, 42)
+        self.assertEqual(resumed.count, whole.count)
+        self.assertAlmostEqual(resumed.mean, whole.mean)
+        self.assertAlmostEqual(resumed.variance, whole.variance)
+        self.assertEqual(resumed.histogram, whole.histogram)
+        self.assertEqual(resumed.summary()["quantiles"],
+                         whole.summary()["quantiles"])
+
+    def test_untracked_quantile_is_a_key_error(self):
+        with self.assertRaises(KeyError):
+            stream_stats.StreamingStats().quantile(0.75)
+
+
+class RefreshTest(unittest.TestCase):
+
+    def test_refresh_only_reads_new_rows(self):
+        path = os.path.join(tmpdir.name, "age_stats.json")
+        first, second = [20, 30, 40], [50, 60]
+        insert_ages(first)
+        stats = stream_stats.refresh(path)
+        self.assertEqual(stats.count, 3)
+        seen = stats.last_seq
+
+        insert_ages(second)
+        with mock.patch.object(stream_stats, "stream_ages_since",
+                               wraps=stream_stats.stream_ages_since) as read:
+            stats = stream_stats.refresh(path)
+        read.assert_called_once_with(seen)
+        self.assertEqual(stats.count, 5)
+        self.assertAlmostEqual(stats.mean, statistics.mean(first + second))
+        self.assertAlmostEqual(stats.variance,
+                               statistics.variance(first + second))
+        self.assertEqual(stream_stats.refresh(path).count, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()